@@ -0,0 +1,165 @@
+import os
+import base64
+import binascii
+import tempfile
+import requests
+from concurrent.futures import ThreadPoolExecutor
+
+CHUNK_SIZE = 64 * 1024  # Bytes read from the network / base64 chars decoded per step
+MAX_ATTACHMENT_BYTES = 50 * 1024 * 1024  # Abort anything bigger than this
+DOWNLOAD_TIMEOUT = 30  # Seconds for connecting and between received chunks
+MAX_DOWNLOAD_WORKERS = 4
+
+class AttachmentError(Exception):
+    """
+    Raised when an attachment can't be downloaded or decoded.
+    """
+
+def pdf_filename(part):
+    """
+    Returns the attachment's filename, making sure it ends with .pdf.
+    """
+    filename = os.path.basename(part.get("filename") or "attachment.pdf")
+    # Ensure filename is valid
+    if not filename.lower().endswith('.pdf'):
+        filename += '.pdf'
+    return filename
+
+def _write_atomically(file_path, chunks):
+    """
+    Writes chunks to a temp file and moves it into place only once everything arrived.
+    """
+    tmp_path = f"{file_path}.part"
+    written = 0
+    try:
+        with open(tmp_path, "wb") as f:
+            for chunk in chunks:
+                f.write(chunk)
+                written += len(chunk)
+        if written == 0:
+            raise AttachmentError("the content is empty")
+        os.replace(tmp_path, file_path)
+    finally:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+    return written
+
+def download_attachment(url, file_path, session=None, timeout=DOWNLOAD_TIMEOUT, max_bytes=MAX_ATTACHMENT_BYTES):
+    """
+    Streams url to file_path in chunks, aborting as soon as the body exceeds max_bytes.
+    """
+    http = session or requests
+    try:
+        response = http.get(url, stream=True, timeout=timeout)
+    except requests.RequestException as e:
+        raise AttachmentError(f"download failed: {e}")
+
+    with response:
+        if response.status_code != 200:
+            raise AttachmentError(f"Status Code: {response.status_code}")
+        declared = response.headers.get('Content-Length')
+        if declared and declared.isdigit() and int(declared) > max_bytes:
+            raise AttachmentError(f"attachment is {declared} bytes, over the {max_bytes} byte limit")
+
+        def chunks():
+            received = 0
+            try:
+                for chunk in response.iter_content(chunk_size=CHUNK_SIZE):
+                    received += len(chunk)
+                    if received > max_bytes:
+                        raise AttachmentError(f"attachment exceeds the {max_bytes} byte limit")
+                    yield chunk
+            except requests.RequestException as e:
+                raise AttachmentError(f"download failed: {e}")
+
+        return _write_atomically(file_path, chunks())
+
+def decode_base64_attachment(content, file_path, max_bytes=MAX_ATTACHMENT_BYTES):
+    """
+    Decodes inline base64 content to file_path a chunk at a time.
+    Accepts both standard and URL-safe alphabets and ignores embedded whitespace.
+    """
+    # Reject obviously oversized content before decoding anything
+    encoded_length = len(content) - content.count('\n') - content.count('\r')
+    if encoded_length * 3 // 4 - 2 > max_bytes:
+        raise AttachmentError(f"attachment exceeds the {max_bytes} byte limit")
+
+    def chunks():
+        carry = ''
+        decoded = 0
+        for start in range(0, len(content), CHUNK_SIZE):
+            piece = carry + ''.join(content[start:start + CHUNK_SIZE].split())
+            # Only decode whole 4-character groups, keep the rest for the next chunk
+            usable = len(piece) - len(piece) % 4
+            carry = piece[usable:]
+            groups = [piece[:usable]]
+            if start + CHUNK_SIZE >= len(content) and carry.rstrip('='):
+                # Unpadded tail at the very end
+                groups.append(carry + '=' * (-len(carry) % 4))
+            for group in groups:
+                if not group:
+                    continue
+                chunk = _b64decode(group)
+                decoded += len(chunk)
+                if decoded > max_bytes:
+                    raise AttachmentError(f"attachment exceeds the {max_bytes} byte limit")
+                yield chunk
+
+    return _write_atomically(file_path, chunks())
+
+def _b64decode(data):
+    try:
+        return base64.b64decode(data.replace('-', '+').replace('_', '/'), validate=True)
+    except (binascii.Error, ValueError) as e:
+        raise AttachmentError(f"Failed to decode the content: {e}")
+
+def fetch_attachments(parts, download_dir, max_workers=MAX_DOWNLOAD_WORKERS,
+                      timeout=DOWNLOAD_TIMEOUT, max_bytes=MAX_ATTACHMENT_BYTES, store=None):
+    """
+    Saves every PDF attachment in the email parts to download_dir.
+    Linked attachments are streamed in parallel on a bounded pool; inline base64 parts
+    are decoded incrementally. With a store, each file is moved into the content-addressed
+    store instead, so attachments sharing a filename never overwrite each other.
+    Returns one dict per attachment, in part order, with 'filename', 'path', 'sha'
+    (only with a store) and 'error' (None on success).
+    """
+    os.makedirs(download_dir, exist_ok=True)
+    session = requests.Session()
+    jobs = []
+    for part in parts:
+        # Check if there's an attachment link
+        if part.get('attachmentLink'):
+            jobs.append((part, 'link'))
+        # Check if the content is in base64 format and not empty
+        elif part.get("mimeType") == "application/pdf" and part.get("content"):
+            jobs.append((part, 'inline'))
+
+    def fetch(job):
+        part, kind = job
+        filename = pdf_filename(part)
+        if store:
+            # Unique staging name, the store takes over once the bytes are complete
+            fd, file_path = tempfile.mkstemp(prefix='.incoming_', suffix='.pdf', dir=download_dir)
+            os.close(fd)
+        else:
+            file_path = os.path.join(download_dir, filename)
+        try:
+            if kind == 'link':
+                download_attachment(part['attachmentLink'], file_path, session, timeout, max_bytes)
+            else:
+                decode_base64_attachment(part['content'], file_path, max_bytes)
+        except AttachmentError as e:
+            if store and os.path.exists(file_path):
+                os.remove(file_path)
+            return {'filename': filename, 'path': None, 'sha': None, 'error': str(e)}
+        sha = None
+        if store:
+            sha = store.put_file(file_path, filename)
+            file_path = store.path(sha)
+        return {'filename': filename, 'path': file_path, 'sha': sha, 'error': None}
+
+    try:
+        with ThreadPoolExecutor(max_workers=max_workers) as pool:
+            return list(pool.map(fetch, jobs))
+    finally:
+        session.close()
@@ -2,36 +2,62 @@ import os
 import json
 import requests
 import re
+import logging
+import hashlib
+from concurrent.futures import ThreadPoolExecutor
 from dotenv import load_dotenv
 from fillpdf import fillpdfs
+import fitz  # PyMuPDF
 from pypdf import PdfReader
+from cache import CACHE_DIR, DiskCache
+from llm_client import get_client
+from resolver import resolve_fields, extract_facts
+from templates import TemplateRegistry, template_fingerprint
+from validation import parse_json_object, validate_form_data
+from extractor import decode_field_flags, extract_fields
+from pdf_utils import optimize_pdf, OPTIMIZE_OUTPUT
+from email_context import estimate_tokens, fit_to_budget
+from store import file_sha256, context_key
+from instrumentation import span, count, record_usage, record_document
 
-def decode_field_flags(field_flags):
-    """
-    Decodes the field flags integer into a list of flag names.
-    """
-    flags = int(field_flags)
-    flag_info = []
-    if flags & (1 << 0):
-        flag_info.append('ReadOnly')
-    if flags & (1 << 1):
-        flag_info.append('Required')
-    if flags & (1 << 12):
-        flag_info.append('Password')
-    if flags & (1 << 13):
-        flag_info.append('FileSelect')
-    if flags & (1 << 14):
-        flag_info.append('DoNotSpellCheck')
-    if flags & (1 << 15):
-        flag_info.append('DoNotScroll')
-    if flags & (1 << 17):
-        flag_info.append('Comb')
-    # Add more flags as needed
-    return flag_info
+logger = logging.getLogger(__name__)
+
+# Field lists and page counts of PDFs we have already extracted, keyed by the file hash.
+# The file name is versioned so lists in an older format are not reused.
+FIELD_CACHE = DiskCache(os.path.join(CACHE_DIR, 'fields_v4.sqlite3'), max_entries=512)
+
+# Parsed ChatGPT answers, keyed by field schema + normalized email text + model parameters
+RESPONSE_CACHE = DiskCache(os.path.join(CACHE_DIR, 'responses.sqlite3'), max_entries=1024, ttl=24 * 60 * 60)
+
+# Learned field -> slot mappings of templates answered before, one editable JSON file each
+TEMPLATES = TemplateRegistry()
+
+MODEL_PARAMS = {
+    'model': 'gpt-4o',  # Use 'gpt-4' if you have access
+    'temperature': 0.7,
+    'max_tokens': 1000,  # Adjust as needed
+}
+
+BATCH_TOKEN_BUDGET = 8000  # Max estimated prompt tokens for one multi-form request
+ANSWER_TOKENS_PER_FIELD = 15  # Rough size of one "name": "value" pair in the reply
+FORM_KEY_SEPARATOR = '::'  # Namespaces field names as form<i>::<name> in batched prompts
+SHARD_TOKEN_BUDGET = 8000  # Max estimated prompt tokens for one shard of a large form
+SHARD_CONCURRENCY = 4  # Shards of one form answered in parallel
+CONTEXT_TOKEN_SHARE = 0.5  # Share of a request's token budget the email text may take
+REPAIR_ROUNDS = 2  # How many times fields that fail validation are asked for again
+EXTRACT_BACKEND = os.getenv('AUTOFILL_EXTRACT_BACKEND', 'pypdf')  # 'pypdf' or 'fitz'
+LAYOUT_KEYS = ('page', 'rect')  # Field list keys that are not sent to ChatGPT
+
+class FormFillError(Exception):
+    """
+    Raised when a single document can't be extracted or answered.
+    """
 
 def process_fields(fields, field_list):
     """
     Recursively processes PDF form fields to extract detailed parameters.
+    This is the original extractor, kept for comparison in benchmarks/bench_extract.py;
+    extract_pdf_fields uses extractor.extract_fields.
     """
     for field in fields:
         field_info = {}
@@ -56,7 +82,7 @@ def process_fields(fields, field_list):
         if default_value:
             field_info['default_value'] = str(default_value)
         if field_flags:
-            field_info['field_flags'] = decode_field_flags(field_flags)
+            field_info['field_flags'] = decode_field_flags(field_flags, field_type)
         if options:
             field_info['options'] = [str(option) for option in options]
 
@@ -65,30 +91,59 @@ def process_fields(fields, field_list):
         if kids:
             process_fields(kids, field_list)
 
-def extract_pdf_fields(pdf_path):
+def extract_pdf_fields(pdf_path, use_cache=True, backend=EXTRACT_BACKEND):
     """
-    Extracts form fields from the PDF and returns a list of field parameters.
+    Extracts form fields from the PDF and returns a list of field parameters, one per
+    terminal field with its fully qualified name, page index and rect.
+    backend is 'pypdf' or 'fitz' (PyMuPDF). A file that was extracted before is served
+    from FIELD_CACHE by its content hash without opening it again.
     """
-    pdf = PdfReader(pdf_path)
-    field_list = []
-    acroform = pdf.trailer['/Root'].get('/AcroForm')
-    if acroform:
-        fields = acroform.get('/Fields')
-        if fields:
-            process_fields(fields, field_list)
+    with span('extract', document=pdf_path, backend=backend):
+        is_path = isinstance(pdf_path, (str, os.PathLike))
+        # Keyed on the file bytes, so a hit skips parsing the PDF altogether
+        cache_key = f"{backend}:{file_sha256(pdf_path)}" if use_cache and is_path else None
+        cached = FIELD_CACHE.get(cache_key) if cache_key else None
+        if cached is not None:
+            field_list, pages = cached['fields'], cached['pages']
+        elif backend == 'fitz':
+            doc = fitz.open(pdf_path)
+            try:
+                if not doc.is_form_pdf:
+                    raise FormFillError("No AcroForm found in the PDF.")
+                field_list = extract_fields(doc, backend)
+                pages = len(doc)
+            finally:
+                doc.close()
         else:
-            print("No form fields found in the PDF.")
-            exit(1)
-    else:
-        print("No AcroForm found in the PDF.")
-        exit(1)
+            pdf = PdfReader(pdf_path)
+            acroform = pdf.trailer['/Root'].get('/AcroForm')
+            if not acroform:
+                raise FormFillError("No AcroForm found in the PDF.")
+            if not acroform.get('/Fields'):
+                raise FormFillError("No form fields found in the PDF.")
+            field_list = extract_fields(pdf, backend)
+            pages = len(pdf.pages)
+        if cache_key and cached is None and field_list:
+            FIELD_CACHE.set(cache_key, {'fields': field_list, 'pages': pages})
+        if not field_list:
+            raise FormFillError("No form fields found in the PDF.")
+
+    size_bytes = os.path.getsize(pdf_path) if is_path else None
+    record_document(pdf_path, fields=len(field_list), pages=pages, size_bytes=size_bytes)
+    logger.debug("Extracted PDF Form Fields with Parameters:\n%s", json.dumps(field_list, indent=2))
     return field_list
 
-def get_form_data_from_chatgpt(field_list, additional_text=None):
+def prompt_fields(field_list):
     """
-    Sends a prompt to ChatGPT to generate sample data based on field parameters and additional text.
+    The field list as shown to ChatGPT. Page and position only matter for sharding.
     """
-    fields_json = json.dumps(field_list, indent=2)
+    return [{key: value for key, value in field.items() if key not in LAYOUT_KEYS} for field in field_list]
+
+def build_prompt(field_list, additional_text=None):
+    """
+    Builds the completion prompt for a list of fields and optional email text.
+    """
+    fields_json = json.dumps(prompt_fields(field_list), indent=2)
 
     if additional_text:
         prompt = (
@@ -110,64 +165,356 @@ def get_form_data_from_chatgpt(field_list, additional_text=None):
             "Please output only the JSON object without any code formatting, code fences, or additional text.\n\n"
             f"Field Data:\n{fields_json}"
         )
+    return prompt
+
+def normalize_text(text):
+    """
+    Collapses whitespace so trivially different copies of an email share a cache key.
+    """
+    if not text:
+        return ''
+    return re.sub(r'\s+', ' ', text).strip()
+
+def response_cache_key(field_list, additional_text=None, model_params=None):
+    """
+    Canonical hash of the field schema, the normalized email text and the model parameters.
+    """
+    payload = {
+        'fields': field_list,
+        'text': normalize_text(additional_text),
+        'params': model_params or MODEL_PARAMS,
+    }
+    canonical = json.dumps(payload, sort_keys=True, separators=(',', ':'))
+    return hashlib.sha256(canonical.encode('utf-8')).hexdigest()
+
+class TruncatedReplyError(FormFillError):
+    """
+    Raised when ChatGPT ran out of max_tokens before finishing the JSON object.
+    """
+
+def _template_fill(field_list, facts):
+    """
+    Answers what the learned mapping of a known template can from the email facts.
+    Returns (fingerprint, form_data, leftover).
+    """
+    fingerprint = template_fingerprint(field_list)
+    with span('template'):
+        form_data, leftover = TEMPLATES.fill(fingerprint, field_list, facts)
+    if form_data:
+        count('fields_from_template', len(form_data))
+    return fingerprint, form_data, leftover
+
+def fit_context(additional_text, field_list, token_budget):
+    """
+    Trims an email text that would crowd the fields out of a request, keeping the
+    paragraphs that mention them. Otherwise every shard would carry the whole text and
+    a long email would fan out into one request per field.
+    """
+    names = [field['name'] for field in field_list if 'name' in field]
+    trimmed = fit_to_budget(additional_text, int(token_budget * CONTEXT_TOKEN_SHARE), names)
+    if trimmed != additional_text:
+        count('context_trimmed')
+        logger.info("Email text is over %d%% of the token budget, trimmed to %d characters.",
+                    CONTEXT_TOKEN_SHARE * 100, len(trimmed))
+    return trimmed
+
+def get_form_data_from_chatgpt(field_list, additional_text=None, use_cache=True,
+                               token_budget=SHARD_TOKEN_BUDGET, max_concurrency=SHARD_CONCURRENCY,
+                               resolve_locally=True, use_templates=True):
+    """
+    Sends a prompt to ChatGPT to generate sample data based on field parameters and additional text.
+    Templates answered before are filled from their learned field mapping in TEMPLATES first,
+    and every answer is used to extend that mapping (see templates.py).
+    Fields the local resolver can answer (dates, sender details, defaults, single-option
+    fields) are filled first and left out of the prompt; if none are left, no request is made.
+    Large forms are split into shards that fit token_budget and the reply size, answered with up
+    to max_concurrency parallel requests and merged back into one dict.
+    Answers are memoized in RESPONSE_CACHE; pass use_cache=False to force a fresh request.
+    """
+    if use_templates:
+        facts = extract_facts(additional_text)
+        fingerprint, template_data, field_list = _template_fill(field_list, facts)
+        form_data = {}
+        if any('name' in field for field in field_list):
+            form_data = get_form_data_from_chatgpt(field_list, additional_text, use_cache, token_budget,
+                                                   max_concurrency, resolve_locally, use_templates=False)
+        else:
+            count('llm_requests_skipped')
+            logger.info("All %d fields answered from the template mapping, skipping ChatGPT.", len(template_data))
+        TEMPLATES.learn(fingerprint, field_list, form_data, facts, context_key(additional_text)[:16])
+        return {**form_data, **template_data}
+
+    local_data = {}
+    if resolve_locally:
+        with span('resolve'):
+            resolved, field_list = resolve_fields(field_list, additional_text)
+        local_data = {name: entry['value'] for name, entry in resolved.items()}
+        if resolved:
+            count('fields_resolved_locally', len(resolved))
+            logger.debug("Resolved locally:\n%s", json.dumps(resolved, indent=2))
+        if not any('name' in field for field in field_list):
+            count('llm_requests_skipped')
+            logger.info("All %d fields resolved locally, skipping ChatGPT.", len(resolved))
+            return local_data
+
+    additional_text = fit_context(additional_text, field_list, token_budget)
+    # Keyed on the leftover fields only, so resolved values like today's date are never cached
+    cache_key = response_cache_key(field_list, additional_text)
+    cached = RESPONSE_CACHE.get(cache_key) if use_cache else None
+    if cached is not None:
+        count('llm_cache_hits')
+        logger.info("Using cached ChatGPT response.")
+        return {**cached, **local_data}
 
-    # The rest of the function remains the same
     load_dotenv()
     openai_api_key = os.getenv('OPENAI_API_KEY')
     if not openai_api_key:
-        print("Please set the OPENAI_API_KEY in your .env file.")
-        exit(1)
+        raise FormFillError("Please set the OPENAI_API_KEY in your .env file.")
 
-    api_url = "https://api.openai.com/v1/chat/completions"
-    headers = {
-        'Content-Type': 'application/json',
-        'Authorization': f'Bearer {openai_api_key}',
-    }
-    data = {
-        'model': 'gpt-4o',  # Use 'gpt-4' if you have access
-        'messages': [
-            {'role': 'user', 'content': prompt}
-        ],
-        'temperature': 0.7,
-        'max_tokens': 1000,  # Adjust as needed
-    }
+    shards = shard_fields(field_list, additional_text, token_budget)
+    if len(shards) == 1:
+        form_data = _answer_shard(openai_api_key, shards[0], additional_text)
+    else:
+        logger.info("Splitting %d fields into %d shards.", len(field_list), len(shards))
+        count('llm_shards', len(shards))
+        form_data = {}
+        with ThreadPoolExecutor(max_workers=max_concurrency) as pool:
+            for shard_data in pool.map(lambda shard: _answer_shard(openai_api_key, shard, additional_text), shards):
+                form_data.update(shard_data)
 
-    response = requests.post(api_url, headers=headers, json=data)
-    if response.status_code == 200:
-        completion = response.json()
-        message_content = completion['choices'][0]['message']['content']
-        print("ChatGPT Response:")
-        print(message_content)
+    logger.debug("Parsed Form Data:\n%s", json.dumps(form_data, indent=2))
+    RESPONSE_CACHE.set(cache_key, form_data)
+    return {**form_data, **local_data}
+
+def _answer_shard(openai_api_key, field_list, additional_text=None, repair_rounds=REPAIR_ROUNDS):
+    """
+    Answers one shard and validates the reply against its fields. Fields whose values
+    can't be repaired locally are asked for again on their own, up to repair_rounds times.
+    A reply cut off by max_tokens with nothing salvageable is retried as two smaller shards.
+    """
+    try:
+        reply = _request_form_data(openai_api_key, field_list, additional_text)
+    except TruncatedReplyError:
+        if len(field_list) < 2:
+            raise
+        count('llm_shard_splits')
+        middle = len(field_list) // 2
+        logger.info("ChatGPT reply was truncated, retrying %d fields as two shards.", len(field_list))
+        form_data = _answer_shard(openai_api_key, field_list[:middle], additional_text, repair_rounds)
+        form_data.update(_answer_shard(openai_api_key, field_list[middle:], additional_text, repair_rounds))
+        return form_data
+
+    with span('validate'):
+        form_data, failed = validate_form_data(field_list, reply)
+    names = {field.get('name') for field in field_list}
+    unknown = [key for key in reply if key not in names]
+    if unknown:
+        logger.warning("Ignoring %d unknown keys in ChatGPT response: %s", len(unknown), unknown[:10])
+    if not failed:
+        return form_data
+
+    if repair_rounds > 0:
+        count('llm_repair_requests')
+        logger.info("Re-requesting %d of %d fields that failed validation.", len(failed), len(field_list))
         try:
-            # Remove code fences if they exist
-            message_content = message_content.strip()
-            if message_content.startswith("```") and message_content.endswith("```"):
-                # Extract JSON content between code fences
-                message_content = re.sub(r'^```(?:json)?\n', '', message_content)
-                message_content = re.sub(r'\n```$', '', message_content)
-            form_data = json.loads(message_content)
-            print("\nParsed Form Data:")
-            print(json.dumps(form_data, indent=2))
+            form_data.update(_answer_shard(openai_api_key, failed, additional_text, repair_rounds - 1))
             return form_data
-        except json.JSONDecodeError as e:
-            print(f"Failed to parse JSON from ChatGPT response: {e}")
-            exit(1)
+        except FormFillError as e:
+            if not reply:
+                raise
+            logger.warning("Re-request failed, keeping the valid answers: %s", e)
+    elif not reply:
+        raise FormFillError("Failed to parse JSON from ChatGPT response.")
+    count('fields_failed_validation', len(failed))
+    logger.warning("Leaving %d fields empty after validation: %s",
+                   len(failed), [field['name'] for field in failed][:10])
+    return form_data
+
+def _request_form_data(openai_api_key, field_list, additional_text=None):
+    """
+    Sends a single completion request for field_list and parses the JSON object in the reply.
+    The values are not checked here; see validate_form_data.
+    """
+    with span('prompt_build'):
+        prompt = build_prompt(field_list, additional_text)
+
+    data = dict(MODEL_PARAMS)
+    data['messages'] = [
+        {'role': 'user', 'content': prompt}
+    ]
+
+    # Shared keep-alive client; retries 429/5xx and respects the rate limits
+    try:
+        with span('llm_call', model=data['model']):
+            response = get_client(openai_api_key).create(data, estimated_tokens=estimate_tokens(prompt))
+    except requests.RequestException as e:
+        raise FormFillError(f"Request to ChatGPT failed: {e}")
+    if response.status_code == 200:
+        completion = response.json()
+        record_usage(completion.get('usage'), model=data['model'])
+        choice = completion['choices'][0]
+        message_content = choice['message']['content']
+        logger.debug("ChatGPT Response:\n%s", message_content)
+        with span('json_parse'):
+            # Tolerates code fences and surrounding prose, and salvages cut-off objects
+            form_data, complete = parse_json_object(message_content)
+        if not complete:
+            if not form_data and choice.get('finish_reason') == 'length':
+                raise TruncatedReplyError(f"ChatGPT reply for {len(field_list)} fields hit max_tokens.")
+            count('llm_partial_replies')
+            logger.warning("ChatGPT response was not a complete JSON object, salvaged %d values.", len(form_data))
+        return form_data
     else:
-        print(f"Request failed with status code {response.status_code}: {response.text}")
-        exit(1)
+        raise FormFillError(f"Request failed with status code {response.status_code}: {response.text}")
 
+def answer_tokens(field_list):
+    """
+    Expected size of the reply for these fields; each "name": "value" pair repeats the name.
+    """
+    return sum(ANSWER_TOKENS_PER_FIELD + estimate_tokens(field['name']) for field in field_list if 'name' in field)
+
+def batch_field_lists(field_lists, additional_text=None, token_budget=BATCH_TOKEN_BUDGET):
+    """
+    Groups form indices into batches whose combined prompt stays under token_budget.
+    The email text is counted once per batch and the expected reply must fit in max_tokens.
+    """
+    text_tokens = estimate_tokens(build_prompt([], additional_text))
+    batches = []
+    current, current_tokens, current_answer = [], text_tokens, 0
+    for index, field_list in enumerate(field_lists):
+        form_tokens = estimate_tokens(json.dumps(prompt_fields(field_list), indent=2))
+        form_answer = answer_tokens(field_list)
+        over_budget = (current_tokens + form_tokens > token_budget
+                       or current_answer + form_answer > MODEL_PARAMS['max_tokens'])
+        if current and over_budget:
+            batches.append(current)
+            current, current_tokens, current_answer = [], text_tokens, 0
+        current.append(index)
+        current_tokens += form_tokens
+        current_answer += form_answer
+    if current:
+        batches.append(current)
+    return batches
 
-def populate_pdf_fillpdf(pdf_path, output_path, form_data):
+def _field_group(field):
+    """
+    Shard grouping key: the page when extraction recorded one, otherwise the leading
+    part of the name (e.g. 'applicant' for 'applicant.address' or 'applicant_name').
+    """
+    if field.get('page') is not None:
+        return ('page', field['page'])
+    return ('prefix', re.split(r'[.\[_\s]', field.get('name', ''), maxsplit=1)[0])
+
+def shard_fields(field_list, additional_text=None, token_budget=SHARD_TOKEN_BUDGET):
+    """
+    Splits a field list into shards whose prompt stays under token_budget and whose reply
+    fits in max_tokens. Fields of the same page or name prefix are kept together where
+    possible. A form that fits in one request comes back unchanged as a single shard.
+    """
+    text_tokens = estimate_tokens(build_prompt([], additional_text))
+    max_answer = MODEL_PARAMS['max_tokens']
+    named = [field for field in field_list if 'name' in field]
+    if (answer_tokens(named) <= max_answer
+            and text_tokens + estimate_tokens(json.dumps(prompt_fields(field_list), indent=2)) <= token_budget):
+        return [field_list]
+
+    groups = {}
+    for field in named:
+        groups.setdefault(_field_group(field), []).append(field)
+
+    shards = []
+    current, current_tokens, current_answer = [], text_tokens, 0
+    for group in groups.values():
+        group_tokens = estimate_tokens(json.dumps(prompt_fields(group), indent=2))
+        if current and (current_tokens + group_tokens > token_budget
+                        or current_answer + answer_tokens(group) > max_answer):
+            shards.append(current)
+            current, current_tokens, current_answer = [], text_tokens, 0
+        # Groups that don't fit in a shard on their own are cut into pieces
+        for field in group:
+            field_tokens = estimate_tokens(json.dumps(prompt_fields([field]), indent=2))
+            field_answer = answer_tokens([field])
+            if current and (current_tokens + field_tokens > token_budget
+                            or current_answer + field_answer > max_answer):
+                shards.append(current)
+                current, current_tokens, current_answer = [], text_tokens, 0
+            current.append(field)
+            current_tokens += field_tokens
+            current_answer += field_answer
+    if current:
+        shards.append(current)
+    return shards
+
+def get_form_data_batch(field_lists, additional_text=None, token_budget=BATCH_TOKEN_BUDGET, use_cache=True,
+                        use_templates=True):
+    """
+    Answers several forms that share the same email text with as few requests as possible.
+    Field names are namespaced per form in the prompt and the reply is split back into
+    one form_data dict per entry of field_lists. Known templates are filled from their
+    learned mapping first, so only the rest of each form goes into the batch.
+    """
+    template_data = [{} for _ in field_lists]
+    if use_templates:
+        facts = extract_facts(additional_text)
+        fingerprints = []
+        field_lists = list(field_lists)
+        for index, field_list in enumerate(field_lists):
+            fingerprint, template_data[index], field_lists[index] = _template_fill(field_list, facts)
+            fingerprints.append(fingerprint)
+
+    form_data_list = [{} for _ in field_lists]
+    prompt_text = fit_context(additional_text, [field for field_list in field_lists for field in field_list], token_budget)
+    for batch in batch_field_lists(field_lists, prompt_text, token_budget):
+        batch = [index for index in batch if any('name' in field for field in field_lists[index])]
+        if not batch:
+            continue
+        if len(batch) == 1:
+            index = batch[0]
+            form_data_list[index] = get_form_data_from_chatgpt(field_lists[index], additional_text, use_cache,
+                                                               use_templates=False)
+            continue
+
+        combined = []
+        for index in batch:
+            for field in field_lists[index]:
+                if 'name' in field:
+                    combined.append(dict(field, name=f"form{index}{FORM_KEY_SEPARATOR}{field['name']}"))
+        combined_data = get_form_data_from_chatgpt(combined, additional_text, use_cache, use_templates=False)
+
+        for key, value in combined_data.items():
+            prefix, sep, name = key.partition(FORM_KEY_SEPARATOR)
+            if not sep or not prefix.startswith('form') or not prefix[4:].isdigit():
+                continue
+            index = int(prefix[4:])
+            if index in batch:
+                form_data_list[index][name] = value
+
+    if not use_templates:
+        return form_data_list
+    context = context_key(additional_text)[:16]
+    for index, field_list in enumerate(field_lists):
+        TEMPLATES.learn(fingerprints[index], field_list, form_data_list[index], facts, context)
+    return [{**form_data, **template_data[index]} for index, form_data in enumerate(form_data_list)]
+
+def populate_pdf_fillpdf(pdf_path, output_path, form_data, optimize=OPTIMIZE_OUTPUT):
     """
     Fills the PDF form using fillpdf and flattens it to make filled fields visible.
+    fillpdf writes every object uncompressed, so with optimize the result is rewritten
+    compactly afterwards.
     """
     # Fill the PDF form
-    fillpdfs.write_fillable_pdf(pdf_path, output_path, form_data)
+    with span('fill', document=pdf_path):
+        fillpdfs.write_fillable_pdf(pdf_path, output_path, form_data)
 
     # Flatten the PDF to make the form fields visible
-    fillpdfs.flatten_pdf(output_path, output_path)
+    with span('flatten', document=pdf_path):
+        fillpdfs.flatten_pdf(output_path, output_path)
 
-    print(f"Filled PDF saved as {output_path}")
+    if optimize:
+        with span('optimize', document=pdf_path):
+            optimize_pdf(output_path)
+
+    logger.info("Filled PDF saved as %s", output_path)
 
 def main():
     pdf_path = 'test.pdf'  # Path to your input PDF file
@@ -176,10 +523,6 @@ def main():
     # Extract field parameters from the PDF
     field_list = extract_pdf_fields(pdf_path)
 
-    # Print detailed field information
-    print("Extracted PDF Form Fields with Parameters:")
-    print(json.dumps(field_list, indent=2))
-
     # Generate sample data using ChatGPT
     form_data = get_form_data_from_chatgpt(field_list)
 
@@ -193,13 +536,8 @@ def fill_pdf_form(input_pdf, output_pdf, additional_text=None):
     # Extract field parameters from the PDF
     field_list = extract_pdf_fields(pdf_path)
 
-    # Print detailed field information
-    print("Extracted PDF Form Fields with Parameters:")
-    print(json.dumps(field_list, indent=2))
-
     # Generate sample data using ChatGPT
     form_data = get_form_data_from_chatgpt(field_list, additional_text)
 
     # Fill the PDF form with the generated data
     populate_pdf_fillpdf(pdf_path, output_pdf_path, form_data)
-
@@ -0,0 +1,71 @@
+"""
+Compares the original recursive field extraction with the extractor backends.
+
+    python benchmarks/bench_extract.py --fields 5000 --pages 100 --depth 3 --widgets 2 --repeat 5
+    python benchmarks/bench_extract.py form.pdf
+"""
+import os
+import sys
+import time
+import argparse
+import tempfile
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.dirname(BENCH_DIR))
+sys.path.insert(0, BENCH_DIR)
+
+import fitz  # PyMuPDF
+from pypdf import PdfReader
+from autofill import process_fields
+from extractor import extract_fields
+from synthetic import generate_form
+
+def legacy(pdf_path):
+    fields = PdfReader(pdf_path).trailer['/Root']['/AcroForm']['/Fields']
+    field_list = []
+    process_fields(fields, field_list)
+    return field_list
+
+def with_pypdf(pdf_path):
+    return extract_fields(PdfReader(pdf_path), 'pypdf')
+
+def with_fitz(pdf_path):
+    doc = fitz.open(pdf_path)
+    try:
+        return extract_fields(doc, 'fitz')
+    finally:
+        doc.close()
+
+ENGINES = [('process_fields', legacy), ('extractor/pypdf', with_pypdf), ('extractor/fitz', with_fitz)]
+
+def time_it(func, repeat, pdf_path):
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = func(pdf_path)
+        timings.append(time.perf_counter() - start)
+    return min(timings), sum(timings) / len(timings), len(result)
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('pdf', nargs='?', help='Form to extract; a synthetic one is generated if omitted')
+    parser.add_argument('--pages', type=int, default=100)
+    parser.add_argument('--fields', type=int, default=5000)
+    parser.add_argument('--depth', type=int, default=3)
+    parser.add_argument('--options', type=int, default=5)
+    parser.add_argument('--widgets', type=int, default=2)
+    parser.add_argument('--repeat', type=int, default=5)
+    args = parser.parse_args()
+
+    pdf_path = args.pdf
+    if not pdf_path:
+        pdf_path = os.path.join(tempfile.mkdtemp(prefix='bench_'), 'form.pdf')
+        with open(pdf_path, 'wb') as f:
+            f.write(generate_form(args.pages, args.fields, args.depth, args.options, widgets=args.widgets))
+
+    for name, func in ENGINES:
+        best, mean, entries = time_it(func, args.repeat, pdf_path)
+        print(f"{name:<18} best {best * 1000:8.1f} ms  mean {mean * 1000:8.1f} ms  {entries:>7} entries")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,52 @@
+"""
+Compares the file-based fill -> flatten -> sign path with the in-memory one.
+
+    python benchmarks/bench_fill_sign.py form.pdf --repeat 5
+"""
+import os
+import sys
+import time
+import argparse
+import tempfile
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from autofill import extract_pdf_fields, populate_pdf_fillpdf
+from sign import sign_pdf
+from pdf_pipeline import fill_flatten_sign
+
+def sample_form_data(field_list):
+    return {field['name']: 'Sample' for field in field_list if 'name' in field}
+
+def bench_file_based(pdf_path, form_data, signature_image, workdir):
+    filled_pdf = os.path.join(workdir, 'filled.pdf')
+    signed_pdf = os.path.join(workdir, 'signed_filled.pdf')
+    populate_pdf_fillpdf(pdf_path, filled_pdf, form_data)
+    sign_pdf(filled_pdf, signed_pdf, signature_image)
+
+def bench_in_memory(pdf_path, form_data, signature_image, workdir):
+    fill_flatten_sign(pdf_path, form_data, signature_image, os.path.join(workdir, 'signed.pdf'))
+
+def time_it(func, repeat, *args):
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func(*args)
+        timings.append(time.perf_counter() - start)
+    return min(timings), sum(timings) / len(timings)
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('pdf')
+    parser.add_argument('--signature', default='signature.png')
+    parser.add_argument('--repeat', type=int, default=5)
+    args = parser.parse_args()
+
+    form_data = sample_form_data(extract_pdf_fields(args.pdf, use_cache=False))
+    with tempfile.TemporaryDirectory() as workdir:
+        for label, func in (('file-based', bench_file_based), ('in-memory', bench_in_memory)):
+            best, mean = time_it(func, args.repeat, args.pdf, form_data, args.signature, workdir)
+            print(f"{label:>10}: best {best * 1000:.1f} ms, mean {mean * 1000:.1f} ms")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,176 @@
+"""
+Offline benchmark of the fill pipeline stages on synthetic forms.
+
+    python benchmarks/run.py                    # run and compare against baseline.json
+    python benchmarks/run.py --save-baseline    # record the current numbers as the baseline
+    python benchmarks/run.py --scenario large --stage extract --repeat 10
+
+Each stage runs in a fresh process so its peak RSS is measured on its own. ChatGPT is
+replaced by the local stub in stub_llm.py, so no network access or API key is needed.
+"""
+import os
+import sys
+import json
+import time
+import argparse
+import resource
+import tempfile
+import statistics
+import contextlib
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.dirname(BENCH_DIR))
+sys.path.insert(0, BENCH_DIR)
+
+BASELINE_PATH = os.path.join(BENCH_DIR, 'baseline.json')
+SIGNATURE_IMAGE = os.path.join(os.path.dirname(BENCH_DIR), 'signature.png')
+
+SCENARIOS = {
+    'small': {'pages': 2, 'fields': 20, 'depth': 1, 'options': 0},
+    'large': {'pages': 30, 'fields': 300, 'depth': 3, 'options': 5},
+    'huge': {'pages': 100, 'fields': 2000, 'depth': 2, 'options': 5},
+}
+DEFAULT_SCENARIOS = ['small', 'large']
+STAGES = ['extract', 'extract_fitz', 'llm', 'fill', 'sign', 'fill_flatten_sign', 'full']
+DEFAULT_THRESHOLD = 0.25  # Allowed slowdown / memory growth before flagging a regression
+
+def _time_stage(stage, pdf_path, workdir, field_list, form_data, repeat):
+    import autofill
+    from sign import sign_pdf
+    from pdf_pipeline import fill_flatten_sign
+
+    filled_pdf = os.path.join(workdir, 'filled.pdf')
+    signed_pdf = os.path.join(workdir, 'signed.pdf')
+    if stage in ('sign',):
+        autofill.populate_pdf_fillpdf(pdf_path, filled_pdf, form_data)
+
+    timings = []
+    for _ in range(repeat):
+        autofill.FIELD_CACHE.invalidate()
+        autofill.RESPONSE_CACHE.invalidate()
+        start = time.perf_counter()
+        if stage == 'extract':
+            autofill.extract_pdf_fields(pdf_path, use_cache=False)
+        elif stage == 'extract_fitz':
+            autofill.extract_pdf_fields(pdf_path, use_cache=False, backend='fitz')
+        elif stage == 'llm':
+            autofill.get_form_data_from_chatgpt(field_list, 'Benchmark email text.', use_cache=False,
+                                                use_templates=False)
+        elif stage == 'fill':
+            autofill.populate_pdf_fillpdf(pdf_path, filled_pdf, form_data)
+        elif stage == 'sign':
+            sign_pdf(filled_pdf, signed_pdf, SIGNATURE_IMAGE)
+        elif stage == 'fill_flatten_sign':
+            fill_flatten_sign(pdf_path, form_data, SIGNATURE_IMAGE, signed_pdf)
+        elif stage == 'full':
+            autofill.fill_pdf_form(pdf_path, filled_pdf, 'Benchmark email text.')
+            sign_pdf(filled_pdf, signed_pdf, SIGNATURE_IMAGE)
+        timings.append(time.perf_counter() - start)
+    return timings
+
+def run_stage(scenario, stage, repeat, latency):
+    """
+    Runs one stage of one scenario; meant to be called in a fresh worker process.
+    """
+    from synthetic import generate_form
+    from stub_llm import start_stub_server
+
+    workdir = tempfile.mkdtemp(prefix='bench_')
+    # Keep caches and outputs out of the repository
+    os.chdir(workdir)
+    server, base_url = start_stub_server(latency)
+    os.environ['OPENAI_BASE_URL'] = base_url
+    os.environ['OPENAI_API_KEY'] = 'stub'
+    # The stub has no rate limits, don't let the client-side limiter skew the numbers
+    os.environ['OPENAI_RPM'] = os.environ['OPENAI_TPM'] = str(10 ** 9)
+
+    pdf_path = os.path.join(workdir, 'form.pdf')
+    with open(pdf_path, 'wb') as f:
+        f.write(generate_form(**SCENARIOS[scenario]))
+
+    with open(os.devnull, 'w') as devnull, contextlib.redirect_stdout(devnull):
+        import autofill
+        field_list = autofill.extract_pdf_fields(pdf_path, use_cache=False)
+        form_data = autofill.get_form_data_from_chatgpt(field_list, use_cache=False, use_templates=False)
+        timings = _time_stage(stage, pdf_path, workdir, field_list, form_data, repeat)
+    server.shutdown()
+
+    median = statistics.median(timings)
+    return {
+        'seconds': median,
+        'best_seconds': min(timings),
+        'docs_per_second': 1 / median if median else None,
+        'peak_rss_mb': resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024,
+        'pages': SCENARIOS[scenario]['pages'],
+        'fields': SCENARIOS[scenario]['fields'],
+    }
+
+def run(scenarios, stages, repeat, latency):
+    results = {}
+    context = multiprocessing.get_context('spawn')
+    for scenario in scenarios:
+        for stage in stages:
+            with ProcessPoolExecutor(max_workers=1, mp_context=context) as pool:
+                result = pool.submit(run_stage, scenario, stage, repeat, latency).result()
+            results[f"{scenario}/{stage}"] = result
+            print(f"{scenario + '/' + stage:<28} {result['seconds'] * 1000:>9.1f} ms"
+                  f" {result['docs_per_second']:>8.2f} docs/s {result['peak_rss_mb']:>8.1f} MB")
+    return results
+
+def compare(results, baseline, threshold):
+    """
+    Returns the list of metrics that regressed by more than threshold against the baseline.
+    """
+    regressions = []
+    for key, result in results.items():
+        base = baseline.get(key)
+        if not base:
+            continue
+        for metric in ('seconds', 'peak_rss_mb'):
+            if base.get(metric) and result[metric] > base[metric] * (1 + threshold):
+                regressions.append(f"{key} {metric}: {result[metric]:.3f} vs baseline {base[metric]:.3f}")
+    return regressions
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--scenario', action='append', choices=sorted(SCENARIOS))
+    parser.add_argument('--stage', action='append', choices=STAGES)
+    parser.add_argument('--repeat', type=int, default=5)
+    parser.add_argument('--latency', type=float, default=0.0, help='Stub LLM latency in seconds')
+    parser.add_argument('--threshold', type=float, default=DEFAULT_THRESHOLD)
+    parser.add_argument('--baseline', default=BASELINE_PATH)
+    parser.add_argument('--save-baseline', action='store_true')
+    parser.add_argument('--json', help='Also write the results to this file')
+    args = parser.parse_args()
+
+    results = run(args.scenario or DEFAULT_SCENARIOS, args.stage or STAGES, args.repeat, args.latency)
+
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump(results, f, indent=2)
+
+    if args.save_baseline:
+        baseline = {}
+        if os.path.exists(args.baseline):
+            with open(args.baseline) as f:
+                baseline = json.load(f)
+        baseline.update(results)
+        with open(args.baseline, 'w') as f:
+            json.dump(baseline, f, indent=2, sort_keys=True)
+        print(f"Baseline saved to {args.baseline}")
+        return
+
+    if os.path.exists(args.baseline):
+        with open(args.baseline) as f:
+            regressions = compare(results, json.load(f), args.threshold)
+        if regressions:
+            print("Regressions against the baseline:")
+            for regression in regressions:
+                print(f"  {regression}")
+            sys.exit(1)
+        print("No regressions against the baseline.")
+
+if __name__ == '__main__':
+    main()
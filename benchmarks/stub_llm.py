@@ -0,0 +1,112 @@
+"""
+Local stand-in for the chat-completions endpoint, for offline benchmarks.
+
+    python benchmarks/stub_llm.py --port 8765 --latency 0.8
+    OPENAI_BASE_URL=http://127.0.0.1:8765/v1 OPENAI_API_KEY=stub streamlit run front.py
+
+It answers every field listed in the prompt's "Field Data" JSON with a plausible value
+(the first option for choice fields) after the configured latency. Replies longer than
+max_tokens are cut off with finish_reason 'length'.
+"""
+import json
+import time
+import argparse
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+def _fields_from_prompt(prompt):
+    """
+    Pulls the field list JSON out of a prompt built by autofill.build_prompt.
+    """
+    start = prompt.find('Field Data:\n')
+    if start < 0:
+        return []
+    text = prompt[start + len('Field Data:\n'):]
+    end = text.find('\n\nAdditional Text:')
+    if end >= 0:
+        text = text[:end]
+    try:
+        return json.loads(text)
+    except ValueError:
+        return []
+
+def _answer(fields):
+    answer = {}
+    for field in fields:
+        name = field.get('name')
+        if not name:
+            continue
+        if field.get('options'):
+            answer[name] = field['options'][0]
+        else:
+            value = f"Sample {name}"
+            answer[name] = value[:field['max_length']] if field.get('max_length') else value
+    return answer
+
+class StubHandler(BaseHTTPRequestHandler):
+    latency = 0.0
+    requests_served = 0
+    _lock = threading.Lock()
+
+    def do_POST(self):
+        if not self.path.endswith('/chat/completions'):
+            self.send_error(404)
+            return
+        body = json.loads(self.rfile.read(int(self.headers.get('Content-Length', 0))) or b'{}')
+        prompt = ''.join(m.get('content', '') for m in body.get('messages', []))
+        time.sleep(self.latency)
+
+        content = json.dumps(_answer(_fields_from_prompt(prompt)))
+        finish_reason = 'stop'
+        # Cut the reply off at max_tokens like the real endpoint does
+        max_chars = body.get('max_tokens', 0) * 4
+        if max_chars and len(content) > max_chars:
+            content, finish_reason = content[:max_chars], 'length'
+        prompt_tokens = len(prompt) // 4 + 1
+        completion_tokens = len(content) // 4 + 1
+        payload = json.dumps({
+            'id': 'stub',
+            'object': 'chat.completion',
+            'model': body.get('model', 'stub'),
+            'choices': [{'index': 0, 'message': {'role': 'assistant', 'content': content}, 'finish_reason': finish_reason}],
+            'usage': {
+                'prompt_tokens': prompt_tokens,
+                'completion_tokens': completion_tokens,
+                'total_tokens': prompt_tokens + completion_tokens,
+            },
+        }).encode('utf-8')
+        with StubHandler._lock:
+            StubHandler.requests_served += 1
+
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(payload)))
+        self.end_headers()
+        self.wfile.write(payload)
+
+    def log_message(self, format, *args):
+        pass
+
+def start_stub_server(latency=0.0, port=0):
+    """
+    Starts the stub in a daemon thread. Returns (server, base_url).
+    """
+    handler = type('ConfiguredStubHandler', (StubHandler,), {'latency': latency})
+    server = ThreadingHTTPServer(('127.0.0.1', port), handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, f"http://127.0.0.1:{server.server_port}/v1"
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--port', type=int, default=8765)
+    parser.add_argument('--latency', type=float, default=0.0, help='Seconds to wait before answering')
+    args = parser.parse_args()
+    server, base_url = start_stub_server(args.latency, args.port)
+    print(f"Stub completions endpoint listening on {base_url}")
+    try:
+        threading.Event().wait()
+    except KeyboardInterrupt:
+        server.shutdown()
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,133 @@
+"""
+Generates synthetic fillable PDFs for benchmarking.
+
+    python benchmarks/synthetic.py out.pdf --pages 30 --fields 300 --depth 3 --options 5 --widgets 2
+"""
+import io
+import argparse
+import fitz  # PyMuPDF
+from pypdf import PdfReader, PdfWriter
+from pypdf.generic import (
+    ArrayObject, DictionaryObject, FloatObject, NameObject, NumberObject, TextStringObject,
+)
+
+FIELD_HEIGHT = 18
+FIELD_GAP = 6
+MARGIN = 50
+
+def _blank_pages(pages, text_lines):
+    """
+    Pages with some body text and a signature label, like a real form.
+    """
+    doc = fitz.open()
+    for page_number in range(pages):
+        page = doc.new_page()
+        for line in range(text_lines):
+            page.insert_text((MARGIN, MARGIN + line * 11), f"Section {page_number + 1}.{line + 1} "
+                             "Lorem ipsum dolor sit amet, consectetur adipiscing elit.", fontsize=8)
+        page.insert_text((MARGIN, page.rect.height - MARGIN), "Signature:", fontsize=11)
+    data = doc.tobytes()
+    doc.close()
+    return data
+
+def _text(value):
+    return TextStringObject(value)
+
+def generate_form(pages=2, fields=20, depth=1, options=0, option_every=5, text_lines=20, widgets=1):
+    """
+    Returns the bytes of a PDF with `fields` terminal fields spread over `pages` pages.
+    depth > 1 nests every field under depth - 1 levels of named /Kids parents; with
+    options > 0 every option_every-th field is a combo box with that many /Opt entries.
+    widgets > 1 shows every field in that many places, as nameless widget kids.
+    """
+    writer = PdfWriter(clone_from=PdfReader(io.BytesIO(_blank_pages(pages, text_lines))))
+    font = DictionaryObject({
+        NameObject('/Type'): NameObject('/Font'),
+        NameObject('/Subtype'): NameObject('/Type1'),
+        NameObject('/BaseFont'): NameObject('/Helvetica'),
+    })
+    acroform = DictionaryObject({
+        NameObject('/Fields'): ArrayObject(),
+        NameObject('/DA'): _text('/Helv 0 Tf 0 g'),
+        NameObject('/DR'): DictionaryObject({
+            NameObject('/Font'): DictionaryObject({NameObject('/Helv'): writer._add_object(font)}),
+        }),
+    })
+    writer._root_object[NameObject('/AcroForm')] = acroform
+
+    per_page = max(1, -(-fields // pages))
+    for index in range(fields):
+        page_number = min(index // per_page, pages - 1)
+        page = writer.pages[page_number]
+        height = float(page.mediabox.height)
+        slot = index % per_page
+        column, row = divmod(slot, 25)
+        x0 = 300 + column * 90
+        y1 = height - MARGIN - row * (FIELD_HEIGHT + FIELD_GAP)
+
+        field = DictionaryObject({NameObject('/T'): _text(f"field_{index}")})
+        if options and index % option_every == 0:
+            field[NameObject('/FT')] = NameObject('/Ch')
+            field[NameObject('/Ff')] = NumberObject(1 << 17)  # Combo box
+            field[NameObject('/Opt')] = ArrayObject([_text(f"Option {n}") for n in range(options)])
+        else:
+            field[NameObject('/FT')] = NameObject('/Tx')
+            field[NameObject('/MaxLen')] = NumberObject(40)
+
+        if '/Annots' not in page:
+            page[NameObject('/Annots')] = ArrayObject()
+        widget_refs = []
+        for copy in range(widgets):
+            # With one widget the field and its widget share a dictionary
+            widget = field if widgets == 1 else DictionaryObject()
+            offset = copy * 8
+            widget.update({
+                NameObject('/Type'): NameObject('/Annot'),
+                NameObject('/Subtype'): NameObject('/Widget'),
+                NameObject('/Rect'): ArrayObject([FloatObject(x0 + offset), FloatObject(y1 - FIELD_HEIGHT - offset),
+                                                  FloatObject(x0 + 85 + offset), FloatObject(y1 - offset)]),
+                NameObject('/F'): NumberObject(4),
+                NameObject('/DA'): _text('/Helv 0 Tf 0 g'),
+                NameObject('/P'): page.indirect_reference,
+            })
+            widget_ref = writer._add_object(widget)
+            page['/Annots'].append(widget_ref)
+            widget_refs.append(widget_ref)
+        if widgets == 1:
+            field_ref = widget_refs[0]
+        else:
+            field[NameObject('/Kids')] = ArrayObject(widget_refs)
+            field_ref = writer._add_object(field)
+            for widget_ref in widget_refs:
+                widget_ref.get_object()[NameObject('/Parent')] = field_ref
+
+        # Wrap the terminal field in depth - 1 named parents
+        child_ref = field_ref
+        for level in range(depth - 1, 0, -1):
+            parent = DictionaryObject({
+                NameObject('/T'): _text(f"group{level}_{index}"),
+                NameObject('/Kids'): ArrayObject([child_ref]),
+            })
+            parent_ref = writer._add_object(parent)
+            child_ref.get_object()[NameObject('/Parent')] = parent_ref
+            child_ref = parent_ref
+        acroform['/Fields'].append(child_ref)
+
+    output = io.BytesIO()
+    writer.write(output)
+    return output.getvalue()
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('output')
+    parser.add_argument('--pages', type=int, default=2)
+    parser.add_argument('--fields', type=int, default=20)
+    parser.add_argument('--depth', type=int, default=1)
+    parser.add_argument('--options', type=int, default=0)
+    parser.add_argument('--widgets', type=int, default=1)
+    args = parser.parse_args()
+    with open(args.output, 'wb') as f:
+        f.write(generate_form(args.pages, args.fields, args.depth, args.options, widgets=args.widgets))
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,96 @@
+import os
+import json
+import time
+import sqlite3
+import threading
+
+CACHE_DIR = '.cache'  # Default folder for all on-disk caches
+
+class DiskCache:
+    """
+    Small SQLite-backed LRU cache that survives restarts.
+    Each entry is its own row, so a lookup or a store costs the same however big the
+    cache is, and any number of threads and processes can share it. Entries record when
+    they were last used and the least recently used ones are dropped once max_entries
+    is reached. With a ttl (seconds) entries also expire.
+    """
+
+    def __init__(self, path, max_entries=256, ttl=None):
+        self.path = path
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self._ready = False  # The database is created on first access
+        self._lock = threading.Lock()
+
+    def _connect(self):
+        # A fresh connection per call keeps this safe to use from any thread
+        if not self._ready:
+            with self._lock:
+                if not self._ready:
+                    directory = os.path.dirname(self.path)
+                    if directory:
+                        os.makedirs(directory, exist_ok=True)
+                    with sqlite3.connect(self.path, timeout=30, isolation_level=None) as conn:
+                        conn.execute("PRAGMA journal_mode=WAL")
+                        conn.execute(
+                            "CREATE TABLE IF NOT EXISTS entries ("
+                            " key TEXT PRIMARY KEY,"
+                            " value TEXT NOT NULL,"
+                            " created REAL NOT NULL,"
+                            " used REAL NOT NULL)"
+                        )
+                        conn.execute("CREATE INDEX IF NOT EXISTS entries_used ON entries (used)")
+                    self._ready = True
+        return sqlite3.connect(self.path, timeout=30, isolation_level=None)
+
+    def get(self, key):
+        """
+        Returns the cached value for key, or None on a miss.
+        """
+        now = time.time()
+        with self._connect() as conn:
+            row = conn.execute("SELECT value, created FROM entries WHERE key = ?", (key,)).fetchone()
+            if row is not None and self.ttl is not None and now - row[1] > self.ttl:
+                conn.execute("DELETE FROM entries WHERE key = ?", (key,))
+                row = None
+            if row is not None:
+                conn.execute("UPDATE entries SET used = ? WHERE key = ?", (now, key))
+        with self._lock:
+            if row is None:
+                self.misses += 1
+                return None
+            self.hits += 1
+        return json.loads(row[0])
+
+    def set(self, key, value):
+        """
+        Stores value under key and evicts the least recently used entries.
+        """
+        now = time.time()
+        with self._connect() as conn:
+            conn.execute(
+                "INSERT OR REPLACE INTO entries (key, value, created, used) VALUES (?, ?, ?, ?)",
+                (key, json.dumps(value), now, now),
+            )
+            conn.execute(
+                "DELETE FROM entries WHERE key IN"
+                " (SELECT key FROM entries ORDER BY used DESC LIMIT -1 OFFSET ?)",
+                (self.max_entries,),
+            )
+
+    def invalidate(self, key=None):
+        """
+        Drops a single entry, or the whole cache when no key is given.
+        """
+        with self._connect() as conn:
+            if key is None:
+                conn.execute("DELETE FROM entries")
+            else:
+                conn.execute("DELETE FROM entries WHERE key = ?", (key,))
+
+    def stats(self):
+        with self._connect() as conn:
+            size = conn.execute("SELECT COUNT(*) FROM entries").fetchone()[0]
+        return {'hits': self.hits, 'misses': self.misses, 'size': size}
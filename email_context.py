@@ -0,0 +1,170 @@
+import re
+import html
+import base64
+import binascii
+
+# Headers worth keeping in the prompt, in this order
+KEY_HEADERS = ['From', 'To', 'Cc', 'Reply-To', 'Date', 'Subject']
+TEXT_MIME_TYPES = ('text/plain', 'text/html')
+DEFAULT_TOKEN_BUDGET = 1500
+
+def estimate_tokens(text):
+    """
+    Cheap token estimate (about 4 characters per token).
+    """
+    return len(text) // 4 + 1
+
+def html_to_text(markup):
+    """
+    Strips tags, scripts and styles from an HTML body and collapses the whitespace.
+    """
+    markup = re.sub(r'(?is)<(script|style)\b.*?</\1>', ' ', markup)
+    markup = re.sub(r'(?i)<br\s*/?>|</p>|</div>|</tr>|</li>', '\n', markup)
+    markup = re.sub(r'<[^>]+>', ' ', markup)
+    text = html.unescape(markup)
+    text = re.sub(r'[ \t\r\f\v]+', ' ', text)
+    return re.sub(r'\n\s*\n+', '\n\n', text).strip()
+
+def _decode_body(part):
+    """
+    Returns the decoded text of a text/* part, or '' if it has none.
+    """
+    data = part.get('content') or (part.get('body') or {}).get('data')
+    if not data:
+        return ''
+    if not isinstance(data, str):
+        return ''
+    try:
+        # Gmail uses URL-safe base64 without padding
+        raw = base64.urlsafe_b64decode(data + '=' * (-len(data) % 4))
+        return raw.decode('utf-8')
+    except (binascii.Error, ValueError):
+        # Not base64, the body was given as plain text
+        return data
+
+def _is_attachment(part):
+    return bool(part.get('filename') or part.get('attachmentLink')
+                or (part.get('body') or {}).get('attachmentId'))
+
+def iter_text_parts(payload):
+    """
+    Yields (mime_type, text) for every inline text part, skipping attachments and binary parts.
+    """
+    stack = [payload]
+    while stack:
+        part = stack.pop(0)
+        if not isinstance(part, dict):
+            continue
+        mime_type = (part.get('mimeType') or '').lower()
+        if mime_type in TEXT_MIME_TYPES and not _is_attachment(part):
+            text = _decode_body(part)
+            if text:
+                yield mime_type, text
+        stack.extend(part.get('parts') or [])
+
+def extract_headers(email_data):
+    """
+    Returns the key headers of the email as an ordered list of (name, value) pairs.
+    """
+    payload = email_data.get('payload') or {}
+    found = {}
+    for header in payload.get('headers') or []:
+        name = str(header.get('name', '')).lower()
+        if name not in found:
+            found[name] = str(header.get('value', ''))
+    # Some exports put the common headers at the top level instead
+    for name in KEY_HEADERS:
+        value = email_data.get(name.lower())
+        if isinstance(value, str) and name.lower() not in found:
+            found[name.lower()] = value
+    return [(name, found[name.lower()]) for name in KEY_HEADERS if found.get(name.lower())]
+
+def extract_body(email_data):
+    """
+    Returns the email body as plain text, preferring text/plain over text/html.
+    """
+    payload = email_data.get('payload') or {}
+    plain, rich = [], []
+    for mime_type, text in iter_text_parts(payload):
+        if mime_type == 'text/plain':
+            plain.append(text.strip())
+        else:
+            rich.append(html_to_text(text))
+    body = '\n\n'.join(plain or rich)
+    if not body and isinstance(email_data.get('snippet'), str):
+        body = html.unescape(email_data['snippet'])
+    return body
+
+def _name_terms(field_names):
+    """
+    Splits field names like 'applicant_firstName' into lowercase search terms.
+    """
+    terms = set()
+    for name in field_names or []:
+        spaced = re.sub(r'([a-z])([A-Z])', r'\1 \2', str(name))
+        for term in re.split(r'[^A-Za-z0-9]+', spaced.lower()):
+            if len(term) > 2:
+                terms.add(term)
+    return terms
+
+def truncate_to_budget(paragraphs, token_budget, field_names=None):
+    """
+    Keeps the paragraphs most relevant to the field names until token_budget is used up.
+    Relevance is the number of field-name terms a paragraph mentions; the kept
+    paragraphs stay in their original order.
+    """
+    terms = _name_terms(field_names)
+
+    def score(paragraph):
+        words = set(re.findall(r'[a-z0-9]+', paragraph.lower()))
+        return len(words & terms)
+
+    ranked = sorted(range(len(paragraphs)), key=lambda i: (-score(paragraphs[i]), i))
+    kept, used = set(), 0
+    for index in ranked:
+        cost = estimate_tokens(paragraphs[index])
+        if used + cost > token_budget:
+            continue
+        kept.add(index)
+        used += cost
+    return [paragraphs[i] for i in sorted(kept)]
+
+def fit_to_budget(text, token_budget, field_names=None):
+    """
+    Trims plain text to token_budget, keeping the paragraphs most relevant to field_names.
+    Paragraphs too long on their own are split into lines, and lines into budget-sized pieces.
+    """
+    if not text or estimate_tokens(text) <= token_budget:
+        return text
+    max_chars = token_budget * 4
+    pieces = []
+    for paragraph in re.split(r'\n\s*\n', text):
+        paragraph = paragraph.strip()
+        if not paragraph:
+            continue
+        if estimate_tokens(paragraph) <= token_budget:
+            pieces.append(paragraph)
+            continue
+        for line in paragraph.splitlines():
+            line = line.strip()
+            pieces.extend(line[i:i + max_chars] for i in range(0, len(line), max_chars))
+    return '\n\n'.join(truncate_to_budget(pieces, token_budget, field_names))
+
+def build_email_context(email_data, field_names=None, token_budget=DEFAULT_TOKEN_BUDGET):
+    """
+    Turns the email JSON into a compact prompt context: the key headers plus the decoded
+    text body, with attachments and other binary parts left out. If the body is over
+    token_budget, the paragraphs most relevant to field_names are kept.
+    """
+    header_lines = [f"{name}: {value}" for name, value in extract_headers(email_data)]
+    header_text = '\n'.join(header_lines)
+
+    body = extract_body(email_data)
+    paragraphs = [p.strip() for p in re.split(r'\n\s*\n', body) if p.strip()]
+    remaining = token_budget - estimate_tokens(header_text)
+    if estimate_tokens(body) > remaining:
+        paragraphs = truncate_to_budget(paragraphs, max(remaining, 0), field_names)
+
+    sections = [header_text] if header_text else []
+    sections.extend(paragraphs)
+    return '\n\n'.join(sections)
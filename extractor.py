@@ -0,0 +1,244 @@
+import logging
+from pypdf.generic import NameObject
+from pdf_utils import PdfName, PdfRef, parse_pdf_object, MAX_FIELD_DEPTH
+
+logger = logging.getLogger(__name__)
+
+INHERITED_KEYS = ('/FT', '/Ff', '/DV', '/MaxLen', '/Opt')  # Keys terminal fields inherit from their parents
+BACKENDS = ('pypdf', 'fitz')
+
+# Field flag bits from the PDF spec (bit n is 1 << (n - 1)); the meaning of the
+# higher bits depends on the field type
+COMMON_FIELD_FLAGS = [(1 << 0, 'ReadOnly'), (1 << 1, 'Required'), (1 << 2, 'NoExport')]
+TYPED_FIELD_FLAGS = {
+    '/Tx': [(1 << 12, 'Multiline'), (1 << 13, 'Password'), (1 << 20, 'FileSelect'),
+            (1 << 22, 'DoNotSpellCheck'), (1 << 23, 'DoNotScroll'), (1 << 24, 'Comb'),
+            (1 << 25, 'RichText')],
+    '/Btn': [(1 << 14, 'NoToggleToOff'), (1 << 15, 'Radio'), (1 << 16, 'Pushbutton')],
+    '/Ch': [(1 << 17, 'Combo'), (1 << 18, 'Edit'), (1 << 19, 'Sort'), (1 << 21, 'MultiSelect'),
+            (1 << 22, 'DoNotSpellCheck'), (1 << 26, 'CommitOnSelChange')],
+}
+
+def decode_field_flags(field_flags, field_type=None):
+    """
+    Decodes the field flags integer into a list of flag names.
+    """
+    flags = int(field_flags)
+    known = COMMON_FIELD_FLAGS + TYPED_FIELD_FLAGS.get(str(field_type) if field_type else None, [])
+    return [name for bit, name in known if flags & bit]
+
+def field_entry(name, field_type=None, field_flags=None, max_length=None, default_value=None,
+                options=None, page=None, rect=None):
+    """
+    Builds one entry of the field list in the format process_fields uses, plus the
+    page index and rect (PDF coordinates) of the field's first widget.
+    """
+    entry = {'name': name}
+    if field_type:
+        entry['type'] = field_type
+    if max_length:
+        entry['max_length'] = int(max_length)
+    if default_value:
+        entry['default_value'] = default_value
+    if field_flags:
+        entry['field_flags'] = decode_field_flags(field_flags, field_type)
+    if options:
+        entry['options'] = options
+    if page is not None:
+        entry['page'] = page
+    if rect:
+        entry['rect'] = [round(float(v), 1) for v in rect]
+    return entry
+
+def _option_value(option):
+    # /Opt entries are either a text string or an [export value, display text] pair
+    if isinstance(option, (list, tuple)):
+        option = option[0] if option else ''
+    return str(option)
+
+def _is_radio(field_type, field_flags):
+    return field_type == '/Btn' and bool(int(field_flags or 0) & (1 << 15))
+
+# pypdf backend
+
+def _resolve(value):
+    return value.get_object() if value is not None else None
+
+def _annotation_pages(reader):
+    """
+    Maps annotation object numbers to page indices, from each page's /Annots array.
+    """
+    pages = {}
+    for index, page in enumerate(reader.pages):
+        for ref in _resolve(page.get('/Annots')) or []:
+            idnum = getattr(ref, 'idnum', None)
+            if idnum is not None:
+                pages[idnum] = index
+    return pages
+
+def _on_states(widget):
+    appearances = _resolve(widget.get('/AP'))
+    normal = _resolve(appearances.get('/N')) if appearances else None
+    if not hasattr(normal, 'keys'):
+        return []
+    return [str(state)[1:] for state in normal.keys() if state != '/Off']
+
+def extract_fields_pypdf(reader):
+    """
+    Walks the AcroForm of a pypdf PdfReader without recursion and returns one entry per
+    terminal field. Names are fully qualified, inherited attributes are applied, and
+    nameless widget kids are folded into their parent field instead of being listed.
+    """
+    acroform = _resolve(reader.trailer['/Root'].get('/AcroForm'))
+    fields = _resolve(acroform.get('/Fields')) if acroform else None
+    if not fields:
+        return []
+
+    annotation_pages = _annotation_pages(reader)
+    page_numbers = {page.indirect_reference.idnum: index for index, page in enumerate(reader.pages)
+                    if page.indirect_reference is not None}
+
+    field_list = []
+    seen = set()
+    stack = [(ref, '', {}, 0) for ref in reversed(list(fields))]
+    while stack:
+        ref, parent_name, inherited, depth = stack.pop()
+        idnum = getattr(ref, 'idnum', None)
+        if idnum is not None:
+            if idnum in seen:
+                continue  # Broken files can reference a field twice or loop back to a parent
+            seen.add(idnum)
+        node = _resolve(ref)
+        if not hasattr(node, 'get'):
+            continue
+
+        partial = node.get('/T')
+        name = parent_name
+        if partial is not None:
+            name = f"{parent_name}.{partial}" if parent_name else str(partial)
+        attributes = dict(inherited)
+        for key in INHERITED_KEYS:
+            if key in node:
+                attributes[key] = _resolve(node[key])
+
+        kids = list(_resolve(node.get('/Kids')) or [])
+        # Named kids are child fields, nameless ones are widgets; only the first is read
+        if kids and '/T' in _resolve(kids[0]):
+            if depth >= MAX_FIELD_DEPTH:
+                logger.warning("Skipping fields nested deeper than %d levels under %s.", MAX_FIELD_DEPTH, name)
+                continue
+            stack.extend((kid, name, attributes, depth + 1) for kid in reversed(kids))
+            continue
+        if not name:
+            continue
+
+        # Terminal field: its widgets are the nameless kids, or the field itself
+        widgets = kids or [ref]
+        first = _resolve(widgets[0])
+        widget_id = getattr(widgets[0], 'idnum', None)
+        page = annotation_pages.get(widget_id)
+        if page is None and first.get('/P') is not None:
+            page = page_numbers.get(getattr(first.get('/P'), 'idnum', None))
+
+        field_type = attributes.get('/FT')
+        field_type = str(field_type) if field_type else None
+        field_flags = attributes.get('/Ff')
+        options = [_option_value(option) for option in attributes.get('/Opt') or []]
+        if not options and _is_radio(field_type, field_flags):
+            options = [state for widget in widgets for state in _on_states(_resolve(widget))]
+        default_value = attributes.get('/DV')
+        if isinstance(default_value, NameObject):
+            default_value = default_value[1:]
+
+        field_list.append(field_entry(
+            name, field_type, field_flags, attributes.get('/MaxLen'),
+            str(default_value) if default_value else None,
+            options, page, first.get('/Rect'),
+        ))
+    return field_list
+
+# PyMuPDF backend
+
+def extract_fields_fitz(doc):
+    """
+    Same result as extract_fields_pypdf, built from the widget annotations listed in each
+    page's /Annots with PyMuPDF. Pages are never loaded; each object is read once as text
+    and parsed, and parent fields shared by many widgets are only resolved once.
+    """
+    objects = {}
+    fields = {}  # field xref -> (qualified name, inherited attributes)
+
+    def read(xref):
+        if xref not in objects:
+            parsed = parse_pdf_object(doc.xref_object(xref, compressed=True))
+            objects[xref] = parsed if isinstance(parsed, dict) else {}
+        return objects[xref]
+
+    def resolve(value):
+        return read(value) if isinstance(value, PdfRef) else value
+
+    def field_info(xref):
+        chain = []
+        while xref and xref not in fields and xref not in chain and len(chain) <= MAX_FIELD_DEPTH:
+            chain.append(xref)
+            parent = read(xref).get('/Parent')
+            xref = parent if isinstance(parent, PdfRef) else 0
+        name, attributes = fields.get(xref, ('', {}))
+        for link in reversed(chain):
+            node = read(link)
+            partial = node.get('/T')
+            if partial is not None:
+                name = f"{name}.{partial}" if name else str(partial)
+            attributes = dict(attributes)
+            attributes.update((key, resolve(node[key])) for key in INHERITED_KEYS if key in node)
+            fields[link] = (name, attributes)
+        return fields[chain[0]] if chain else fields.get(xref, ('', {}))
+
+    def on_states(widget):
+        normal = resolve((resolve(widget.get('/AP')) or {}).get('/N'))
+        return [state[1:] for state in normal if state != '/Off'] if isinstance(normal, dict) else []
+
+    entries = {}
+    for page_number in range(doc.page_count):
+        annots = resolve(read(doc.page_xref(page_number)).get('/Annots')) or []
+        for xref in annots:
+            if not isinstance(xref, PdfRef):
+                continue
+            widget = read(xref)
+            if widget.get('/Subtype') != '/Widget':
+                continue
+            # A widget is either the field itself or a nameless kid of the field
+            parent = widget.get('/Parent')
+            field_xref = xref if '/T' in widget or not isinstance(parent, PdfRef) else parent
+            name, attributes = field_info(field_xref)
+            if not name:
+                continue
+            field_type = attributes.get('/FT')
+            field_flags = attributes.get('/Ff')
+            if field_xref in entries:
+                if _is_radio(field_type, field_flags):
+                    entries[field_xref].setdefault('options', []).extend(on_states(widget))
+                continue
+
+            options = [_option_value(option) for option in attributes.get('/Opt') or []]
+            if not options and _is_radio(field_type, field_flags):
+                options = on_states(widget)
+            default_value = attributes.get('/DV')
+            if isinstance(default_value, PdfName):
+                default_value = default_value[1:]
+            entries[field_xref] = field_entry(
+                name, field_type, field_flags, attributes.get('/MaxLen'),
+                str(default_value) if default_value else None,
+                options, page_number, resolve(widget.get('/Rect')),
+            )
+    return list(entries.values())
+
+def extract_fields(pdf, backend='pypdf'):
+    """
+    Returns the field list of a PDF given as a pypdf PdfReader or PyMuPDF Document.
+    """
+    if backend not in BACKENDS:
+        raise ValueError(f"Unknown extraction backend {backend!r}, expected one of {BACKENDS}")
+    if backend == 'fitz':
+        return extract_fields_fitz(pdf)
+    return extract_fields_pypdf(pdf)
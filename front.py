@@ -1,11 +1,22 @@
 import streamlit as st
 import json
-import base64
-import requests
 import os
-import time  # For unique filenames
-from autofill import fill_pdf_form
-from sign import sign_pdf
+import time
+from jobs import JobQueue, WorkerPool, QUEUED, RUNNING, FAILED
+from store import AttachmentStore
+from preview import PAGES_PER_VIEW, page_count, thumbnails
+
+JOB_WORKERS = 4  # Background workers shared by every session of this Streamlit instance
+
+@st.cache_resource
+def start_job_workers():
+    """
+    Creates the job queue and starts its worker pool once per Streamlit process.
+    The workers share one attachment store.
+    """
+    job_queue = JobQueue()
+    WorkerPool(job_queue, workers=JOB_WORKERS, store=AttachmentStore()).start()
+    return job_queue
 
 # Page configuration
 st.set_page_config(
@@ -95,6 +106,8 @@ st.markdown(
     unsafe_allow_html=True,
 )
 
+job_queue = start_job_workers()
+
 # Navigation bar using radio buttons
 page = st.radio("", ["Home", "About"], key="navigation", index=0, label_visibility="collapsed")
 
@@ -129,127 +142,10 @@ if page == "Home":
                     with open(file_name, "w") as file:
                         json.dump(json_data, file, indent=2)
 
-                    # Define the download directory
-                    download_dir = "DownloadedPDFs"
-                    os.makedirs(download_dir, exist_ok=True)  # Create the directory if it doesn't exist
-
-                    # Iterate through the 'parts' to find PDFs
-                    pdf_files = []
-                    parts = json_data.get("payload", {}).get("parts", [])
-                    for part in parts:
-                        # Check if there's an attachment link
-                        if 'attachmentLink' in part and part['attachmentLink']:
-                            attachment_link = part['attachmentLink']
-                            filename = part.get("filename", "attachment.pdf")
-                            # Ensure filename is valid
-                            if not filename.lower().endswith('.pdf'):
-                                filename += '.pdf'
-                            file_path = os.path.join(download_dir, filename)
-
-                            # Download the PDF from the attachment link
-                            response = requests.get(attachment_link)
-                            if response.status_code == 200:
-                                with open(file_path, "wb") as pdf_file:
-                                    pdf_file.write(response.content)
-                                pdf_files.append(filename)
-                            else:
-                                st.error(f"Failed to download {filename} from {attachment_link}. Status Code: {response.status_code}")
-                        # Check if the content is in base64 format and not empty
-                        elif part.get("mimeType") == "application/pdf" and part.get("content"):
-                            content = part['content']
-                            filename = part.get("filename", "attachment.pdf")
-                            # Ensure filename is valid
-                            if not filename.lower().endswith('.pdf'):
-                                filename += '.pdf'
-                            file_path = os.path.join(download_dir, filename)
-                            try:
-                                # Decode the base64 content
-                                decoded_content = base64.b64decode(content)
-                                if decoded_content:  # Ensure content is not empty
-                                    with open(file_path, "wb") as pdf_file:
-                                        pdf_file.write(decoded_content)
-                                    pdf_files.append(filename)
-                                else:
-                                    st.warning(f"Skipped downloading {filename} because the content is empty.")
-                            except Exception as e:
-                                st.error(f"Failed to decode the content of {filename}: {e}")
-                        else:
-                            # Skip parts that are not PDFs or have no content/link
-                            continue
-
-                    if pdf_files:
-                        # Display the list of downloaded PDFs with their paths
-                        st.success(f"Downloaded PDF attachments have been saved to the `{download_dir}` folder:")
-                        for pdf in pdf_files:
-                            pdf_path = os.path.join(download_dir, pdf)
-                            st.text(pdf_path)
-
-                        # Use the entire JSON input as the additional_text
-                        additional_text = json_input
-
-                        # Define the path to the signature image
-                        signature_image = 'signature.png'
-                        if not os.path.exists(signature_image):
-                            st.error(f"Signature image `{signature_image}` not found. Please ensure it exists in the working directory.")
-                        else:
-                            # Process the PDFs
-                            signed_pdfs = []
-                            for pdf in pdf_files:
-                                input_pdf = os.path.join(download_dir, pdf)
-                                # Create unique filenames to avoid overwriting
-                                timestamp = int(time.time())
-                                filled_pdf = os.path.join(download_dir, f"filled_{timestamp}_{pdf}")
-                                signed_pdf = os.path.join(download_dir, f"signed_filled_{timestamp}_{pdf}")
-
-                                # Step 1: Fill the PDF form with the provided additional text (JSON)
-                                fill_pdf_form(input_pdf, filled_pdf, additional_text)
-
-                                # Step 2: Sign the filled PDF
-                                sign_pdf(filled_pdf, signed_pdf, signature_image)
-
-                                signed_pdfs.append(signed_pdf)
-
-                                st.info(f"Processed and signed: {signed_pdf}")
-
-                            if signed_pdfs:
-                                st.success("All PDFs have been processed and signed successfully!")
-
-                                # Provide download links and view PDFs
-                                st.markdown("### Processed PDFs:")
-                                for signed_pdf in signed_pdfs:
-                                    pdf_name = os.path.basename(signed_pdf)
-
-                                    # Read the PDF file
-                                    with open(signed_pdf, "rb") as f:
-                                        pdf_data = f.read()
-
-                                    # Provide a single download button with a unique key
-                                    st.download_button(
-                                        label=f"Download {pdf_name}",
-                                        data=pdf_data,
-                                        file_name=pdf_name,
-                                        mime="application/pdf",
-                                        key=f"download_{pdf_name}"
-                                    )
-
-                                    st.markdown(f"**{pdf_name}**")
-
-                                    # Encode PDF to base64 for embedding
-                                    base64_pdf = base64.b64encode(pdf_data).decode('utf-8')
-                                    pdf_display_url = f"data:application/pdf;base64,{base64_pdf}"
-
-                                    # Display the PDF using an iframe without a key
-                                    st.components.v1.iframe(
-                                        pdf_display_url,
-                                        width=700,
-                                        height=500,
-                                        scrolling=True
-                                    )
-
-                            else:
-                                st.warning("No signed PDFs were generated.")
-                    else:
-                        st.warning("No valid PDF attachments found with a valid download link or non-empty base64 content.")
+                    # Hand the email to the background workers; the page only polls the job
+                    job_id = job_queue.submit(json_data)
+                    st.session_state["job_id"] = job_id
+                    st.query_params["job"] = job_id
                 except json.JSONDecodeError as e:
                     st.error(f"Invalid JSON format: {e}")
                 except Exception as e:
@@ -257,6 +153,70 @@ if page == "Home":
             else:
                 st.error("Please enter valid JSON data.")
 
+    # The job ID lives in the URL too, so a browser refresh finds the same results
+    job_id = st.session_state.get("job_id") or st.query_params.get("job")
+    job = job_queue.get(job_id) if job_id else None
+    if job:
+        if job["status"] in (QUEUED, RUNNING):
+            st.info(f"Processing your email ({job['stage']})...")
+            st.progress(job["progress"] or 0.0)
+            time.sleep(1)
+            st.rerun()
+        elif job["status"] == FAILED:
+            st.error(f"An error occurred: {job['error']}")
+        else:
+            for result in job["results"]:
+                if result["error"]:
+                    st.error(f"Failed to process {result['name']}: {result['error']}")
+            signed_pdfs = [(r["name"], r["path"]) for r in job["results"] if r["path"] and os.path.exists(r["path"])]
+
+            failed = sum(1 for result in job["results"] if result["error"])
+            if signed_pdfs:
+                if failed:
+                    st.warning(f"{len(signed_pdfs)} of {len(job['results'])} PDFs were processed and signed.")
+                else:
+                    st.success("All PDFs have been processed and signed successfully!")
+
+                # Provide download links and view PDFs
+                st.markdown("### Processed PDFs:")
+                for pdf_name, signed_pdf in signed_pdfs:
+                    output_key = os.path.basename(signed_pdf)
+
+                    # Provide a single download button with a unique key; this is the only
+                    # place the full PDF is sent to the browser
+                    with open(signed_pdf, "rb") as f:
+                        st.download_button(
+                            label=f"Download {pdf_name}",
+                            data=f,
+                            file_name=pdf_name,
+                            mime="application/pdf",
+                            key=f"download_{output_key}"
+                        )
+
+                    st.markdown(f"**{pdf_name}**")
+
+                    # Preview a few low-resolution page thumbnails at a time, rendered on demand
+                    total_pages = page_count(signed_pdf)
+                    view_count = (total_pages + PAGES_PER_VIEW - 1) // PAGES_PER_VIEW
+                    view = 1
+                    if view_count > 1:
+                        view = st.number_input(
+                            f"Pages {PAGES_PER_VIEW} at a time ({total_pages} pages)",
+                            min_value=1,
+                            max_value=view_count,
+                            value=1,
+                            key=f"preview_{output_key}"
+                        )
+                    first_page = (view - 1) * PAGES_PER_VIEW
+                    images = thumbnails(signed_pdf, first_page)
+                    columns = st.columns(PAGES_PER_VIEW)
+                    for offset, image in enumerate(images):
+                        columns[offset].image(image, caption=f"Page {first_page + offset + 1}")
+            elif not job["results"]:
+                st.warning("No valid PDF attachments found with a valid download link or non-empty base64 content.")
+            else:
+                st.warning("No signed PDFs were generated.")
+
 elif page == "About":
     st.title("About eMail - IT")
     st.markdown(
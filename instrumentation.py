@@ -0,0 +1,132 @@
+import os
+import json
+import time
+import threading
+from contextlib import contextmanager
+
+# Set AUTOFILL_METRICS_FILE to also append every event to a JSON-lines file
+METRICS_FILE_ENV = 'AUTOFILL_METRICS_FILE'
+
+_lock = threading.Lock()
+_spans = {}  # (name, labels) -> [count, total seconds, max seconds]
+_counters = {}  # (name, labels) -> value
+
+def _label_key(labels):
+    return tuple(sorted((k, str(v)) for k, v in labels.items()))
+
+def _emit(event):
+    """
+    Appends one event to the JSON-lines file, if one is configured.
+    """
+    path = os.getenv(METRICS_FILE_ENV)
+    if not path:
+        return
+    event['ts'] = time.time()
+    line = json.dumps(event, default=str)
+    with _lock:
+        with open(path, 'a') as f:
+            f.write(line + '\n')
+
+@contextmanager
+def span(name, **labels):
+    """
+    Times the enclosed block and records it under the stage name.
+
+        with span('extract', document='form.pdf'):
+            ...
+    """
+    start = time.perf_counter()
+    error = None
+    try:
+        yield
+    except BaseException as e:
+        error = type(e).__name__
+        raise
+    finally:
+        seconds = time.perf_counter() - start
+        key = (name, _label_key({k: v for k, v in labels.items() if k != 'document'}))
+        with _lock:
+            stats = _spans.setdefault(key, [0, 0.0, 0.0])
+            stats[0] += 1
+            stats[1] += seconds
+            stats[2] = max(stats[2], seconds)
+        event = {'type': 'span', 'name': name, 'seconds': round(seconds, 6), **labels}
+        if error:
+            event['error'] = error
+        _emit(event)
+
+def count(name, value=1, **labels):
+    """
+    Adds value to a counter.
+    """
+    key = (name, _label_key(labels))
+    with _lock:
+        _counters[key] = _counters.get(key, 0) + value
+
+def record_usage(usage, **labels):
+    """
+    Records the token usage block of a chat completion.
+    """
+    if not usage:
+        return
+    for field in ('prompt_tokens', 'completion_tokens', 'total_tokens'):
+        if field in usage:
+            count(f"llm_{field}", usage[field], **labels)
+    count('llm_requests', 1, **labels)
+    _emit({'type': 'usage', **usage, **labels})
+
+def record_document(document, fields=None, pages=None, size_bytes=None):
+    """
+    Records per-document counters (field count, page count, size in bytes).
+    """
+    event = {'type': 'document', 'document': str(document)}
+    for name, value in (('fields', fields), ('pages', pages), ('bytes', size_bytes)):
+        if value is not None:
+            count(f"document_{name}", value)
+            event[name] = value
+    count('documents', 1)
+    _emit(event)
+
+def snapshot():
+    """
+    Returns the aggregated spans and counters as plain dicts.
+    """
+    with _lock:
+        spans = [{'name': name, 'labels': dict(labels), 'count': c, 'seconds': total, 'max_seconds': peak}
+                 for (name, labels), (c, total, peak) in _spans.items()]
+        counters = [{'name': name, 'labels': dict(labels), 'value': value}
+                    for (name, labels), value in _counters.items()]
+    return {'spans': spans, 'counters': counters}
+
+def _prometheus_labels(labels):
+    if not labels:
+        return ''
+    body = ','.join(f'{k}="{str(v).replace(chr(34), chr(39))}"' for k, v in sorted(labels.items()))
+    return '{' + body + '}'
+
+def prometheus_snapshot():
+    """
+    Renders the current metrics in the Prometheus text exposition format.
+    """
+    data = snapshot()
+    lines = [
+        '# HELP autofill_stage_seconds Time spent per pipeline stage.',
+        '# TYPE autofill_stage_seconds summary',
+    ]
+    for entry in sorted(data['spans'], key=lambda e: e['name']):
+        labels = dict(entry['labels'], stage=entry['name'])
+        lines.append(f"autofill_stage_seconds_count{_prometheus_labels(labels)} {entry['count']}")
+        lines.append(f"autofill_stage_seconds_sum{_prometheus_labels(labels)} {entry['seconds']:.6f}")
+    for entry in sorted(data['counters'], key=lambda e: e['name']):
+        metric = f"autofill_{entry['name']}_total"
+        lines.append(f"# TYPE {metric} counter")
+        lines.append(f"{metric}{_prometheus_labels(entry['labels'])} {entry['value']}")
+    return '\n'.join(lines) + '\n'
+
+def reset():
+    """
+    Clears all aggregated metrics.
+    """
+    with _lock:
+        _spans.clear()
+        _counters.clear()
@@ -0,0 +1,335 @@
+import os
+import json
+import time
+import uuid
+import sqlite3
+import hashlib
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+from autofill import extract_pdf_fields, get_form_data_batch
+from pdf_pipeline import fill_flatten_sign
+from email_context import build_email_context
+from attachments import fetch_attachments
+from store import AttachmentStore, context_key
+from mail_ingest import Checkpoint, iter_mailbox
+
+logger = logging.getLogger(__name__)
+
+JOBS_DB = os.path.join('DownloadedPDFs', 'jobs.sqlite3')
+POLL_INTERVAL = 0.5  # Seconds an idle worker waits before looking for new jobs
+
+# Job life cycle: queued -> running -> done / failed
+QUEUED, RUNNING, DONE, FAILED = 'queued', 'running', 'done', 'failed'
+
+class JobQueue:
+    """
+    Local job queue backed by SQLite, shared by every Streamlit session and worker thread.
+    Jobs, their per-stage progress and their results persist across page reloads and restarts.
+    """
+
+    def __init__(self, db_path=JOBS_DB):
+        self.db_path = db_path
+        directory = os.path.dirname(db_path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        with self._connect() as conn:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS jobs ("
+                " id TEXT PRIMARY KEY,"
+                " status TEXT NOT NULL,"
+                " stage TEXT,"
+                " progress REAL DEFAULT 0,"
+                " email TEXT NOT NULL,"
+                " results TEXT,"
+                " error TEXT,"
+                " created REAL NOT NULL,"
+                " updated REAL NOT NULL)"
+            )
+
+    def _connect(self):
+        # A fresh connection per call keeps this safe to use from any thread
+        conn = sqlite3.connect(self.db_path, timeout=30, isolation_level=None)
+        conn.row_factory = sqlite3.Row
+        return conn
+
+    def submit(self, email_data):
+        """
+        Queues an email for processing and returns its job ID.
+        """
+        job_id = uuid.uuid4().hex
+        now = time.time()
+        with self._connect() as conn:
+            conn.execute(
+                "INSERT INTO jobs (id, status, stage, email, created, updated) VALUES (?, ?, ?, ?, ?, ?)",
+                (job_id, QUEUED, 'queued', json.dumps(email_data), now, now),
+            )
+        return job_id
+
+    def claim(self):
+        """
+        Atomically takes the oldest queued job and marks it running. Returns None if idle.
+        """
+        conn = self._connect()
+        try:
+            conn.execute("BEGIN IMMEDIATE")
+            row = conn.execute(
+                "SELECT * FROM jobs WHERE status = ? ORDER BY created LIMIT 1", (QUEUED,)
+            ).fetchone()
+            if row is None:
+                conn.execute("COMMIT")
+                return None
+            conn.execute(
+                "UPDATE jobs SET status = ?, stage = ?, updated = ? WHERE id = ?",
+                (RUNNING, 'starting', time.time(), row['id']),
+            )
+            conn.execute("COMMIT")
+            return self._row_to_job(row)
+        except Exception:
+            # BEGIN itself fails when another writer holds the lock for longer than the timeout
+            if conn.in_transaction:
+                conn.execute("ROLLBACK")
+            raise
+        finally:
+            conn.close()
+
+    def update(self, job_id, status=None, stage=None, progress=None, results=None, error=None):
+        fields = {'updated': time.time()}
+        if status is not None:
+            fields['status'] = status
+        if stage is not None:
+            fields['stage'] = stage
+        if progress is not None:
+            fields['progress'] = progress
+        if results is not None:
+            fields['results'] = json.dumps(results)
+        if error is not None:
+            fields['error'] = error
+        assignments = ', '.join(f"{name} = ?" for name in fields)
+        with self._connect() as conn:
+            conn.execute(f"UPDATE jobs SET {assignments} WHERE id = ?", (*fields.values(), job_id))
+
+    def get(self, job_id):
+        """
+        Returns the job as a dict, or None if the ID is unknown.
+        """
+        with self._connect() as conn:
+            row = conn.execute("SELECT * FROM jobs WHERE id = ?", (job_id,)).fetchone()
+        return self._row_to_job(row) if row else None
+
+    def requeue_stale(self, older_than=15 * 60):
+        """
+        Puts running jobs whose worker went away (no update for older_than seconds) back in the queue.
+        Finished stages are skipped on the retry thanks to the attachment store.
+        """
+        with self._connect() as conn:
+            conn.execute(
+                "UPDATE jobs SET status = ?, stage = 'queued' WHERE status = ? AND updated < ?",
+                (QUEUED, RUNNING, time.time() - older_than),
+            )
+
+    @staticmethod
+    def _row_to_job(row):
+        job = dict(row)
+        job['email'] = json.loads(job['email'])
+        job['results'] = json.loads(job['results']) if job['results'] else []
+        return job
+
+def _check_signature(signature_image):
+    if not os.path.exists(signature_image):
+        raise FileNotFoundError(f"Signature image `{signature_image}` not found. Please ensure it exists in the working directory.")
+
+def process_email(email_data, signature_image='signature.png', download_dir='DownloadedPDFs', report=None,
+                  store=None):
+    """
+    Runs the whole download -> answer -> fill/sign pipeline for one email.
+    report(stage, progress) is called as the job moves along. Returns one dict per
+    attachment with 'name', 'path' and 'error'. Concurrent jobs should share one store.
+    """
+    report = report or (lambda stage, progress: None)
+    _check_signature(signature_image)
+
+    report('downloading', 0.05)
+    store = store or AttachmentStore()
+    results = []
+    pdf_files = []
+    parts = email_data.get("payload", {}).get("parts", [])
+    for attachment in fetch_attachments(parts, download_dir, store=store):
+        if attachment['error']:
+            results.append({'name': attachment['filename'], 'path': None, 'error': attachment['error']})
+        elif attachment['sha'] not in [sha for _, sha in pdf_files]:
+            pdf_files.append((attachment['filename'], attachment['sha']))
+    return results + _answer_and_sign(email_data, pdf_files, store, signature_image, report)
+
+def _answer_and_sign(email_data, pdf_files, store, signature_image, report):
+    """
+    Extracts, answers, fills and signs the stored attachments (filename, sha) of one email.
+    Each attachment is handled on its own: one that can't be extracted, answered or signed
+    gets its 'error' set and the others carry on. Failed entries also say whether the
+    failure is 'permanent' (the file itself is unusable) or worth retrying.
+    """
+    if not pdf_files:
+        return []
+    results = {sha: {'name': f"signed_filled_{pdf}", 'path': None, 'error': None} for pdf, sha in pdf_files}
+
+    def fail(pdf, sha, e, permanent=False):
+        logger.warning("Failed to process %s: %s", pdf, e)
+        results[sha].update(name=pdf, error=str(e), permanent=permanent)
+
+    report('extracting', 0.2)
+    field_lists = {}
+    for pdf, sha in pdf_files:
+        try:
+            field_lists[sha] = extract_pdf_fields(store.path(sha))
+        except Exception as e:
+            # An unreadable PDF or one without a form fails the same way every time
+            fail(pdf, sha, e, permanent=True)
+    field_names = [field['name'] for fields in field_lists.values() for field in fields if 'name' in field]
+    additional_text = build_email_context(email_data, field_names)
+    ctx = context_key(additional_text)
+
+    # Attachments already signed for this exact email are reused as they are
+    todo = [(pdf, sha) for pdf, sha in pdf_files if sha in field_lists and not store.stage(sha, ctx, 'signed')]
+    report('answering', 0.3)
+    answers = _answer_forms([field_lists[sha] for _, sha in todo], additional_text)
+
+    for count, ((pdf, sha), form_data) in enumerate(zip(todo, answers)):
+        if isinstance(form_data, Exception):
+            fail(pdf, sha, form_data)
+            continue
+        report(f'signing {pdf}', 0.6 + 0.4 * count / len(todo))
+        signed_pdf = store.output_path(sha, ctx, 'signed')
+        try:
+            fill_flatten_sign(store.path(sha), form_data, signature_image, signed_pdf)
+        except Exception as e:
+            fail(pdf, sha, e)
+            continue
+        store.mark(sha, ctx, 'signed', signed_pdf)
+
+    for pdf, sha in pdf_files:
+        if not results[sha]['error']:
+            results[sha]['path'] = store.stage(sha, ctx, 'signed')
+    return [results[sha] for _, sha in pdf_files]
+
+def _answer_forms(field_lists, additional_text):
+    """
+    Answers the forms with one batched request where possible. If the batch fails, each
+    form is answered on its own so one bad form doesn't take the others down; failed
+    entries are the exception instead of a form_data dict.
+    """
+    try:
+        return get_form_data_batch(field_lists, additional_text)
+    except Exception as e:
+        if len(field_lists) < 2:
+            return [e]
+    answers = []
+    for field_list in field_lists:
+        try:
+            answers.append(get_form_data_batch([field_list], additional_text)[0])
+        except Exception as e:
+            answers.append(e)
+    return answers
+
+def default_checkpoint(path, store):
+    """
+    Checkpoint file for a mailbox, kept in the attachment store.
+    """
+    digest = hashlib.sha256(os.path.abspath(path).encode('utf-8')).hexdigest()
+    return os.path.join(store.root, f"mailbox_{digest[:16]}.checkpoint")
+
+def process_mailbox(path, signature_image='signature.png', checkpoint_path=None, workers=4, store=None):
+    """
+    Backfills a mbox, Maildir or .eml folder through the same pipeline as process_email.
+    Messages are streamed from disk and at most 2 * workers are in flight, so memory
+    stays bounded however big the mailbox is. Yields (message key, results) as messages
+    finish. Finished messages go into the checkpoint, so an interrupted run resumes after
+    them. That includes messages whose failures are permanent, like a PDF that isn't a
+    form; those are reported in the results once. Messages with a failure that may clear
+    up (a failed ChatGPT request, say) are left out and retried on the next run.
+    """
+    _check_signature(signature_image)
+    store = store or AttachmentStore()
+    checkpoint = Checkpoint(checkpoint_path or default_checkpoint(path, store))
+    if len(checkpoint):
+        logger.info("Resuming %s, %d messages already done.", path, len(checkpoint))
+
+    def run(email_data, attachments):
+        pdf_files = []
+        for filename, data in attachments:
+            sha = store.put_bytes(data, filename)
+            if sha not in [s for _, s in pdf_files]:
+                pdf_files.append((filename, sha))
+        return _answer_and_sign(email_data, pdf_files, store, signature_image, lambda stage, progress: None)
+
+    def finish(done):
+        for future in done:
+            key = pending.pop(future)
+            try:
+                results = future.result()
+            except Exception as e:
+                logger.error("Failed to process message %s: %s", key, e)
+                results = [{'name': key, 'path': None, 'error': str(e)}]
+            else:
+                if all(result.get('permanent', True) for result in results if result['error']):
+                    checkpoint.mark(key)
+            yield key, results
+
+    pending = {}
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        for key, email_data, attachments in iter_mailbox(path, checkpoint):
+            pending[pool.submit(run, email_data, attachments)] = key
+            if len(pending) >= 2 * workers:
+                done, _ = wait(pending, return_when=FIRST_COMPLETED)
+                yield from finish(done)
+        while pending:
+            done, _ = wait(pending, return_when=FIRST_COMPLETED)
+            yield from finish(done)
+
+class WorkerPool:
+    """
+    Daemon threads that take jobs off the queue and run process_email on them.
+    All workers share one attachment store.
+    """
+
+    def __init__(self, job_queue, workers=4, signature_image='signature.png', store=None):
+        self.job_queue = job_queue
+        self.signature_image = signature_image
+        self.store = store or AttachmentStore()
+        self._stop = threading.Event()
+        self.threads = [threading.Thread(target=self._run, daemon=True, name=f"job-worker-{n}")
+                        for n in range(workers)]
+
+    def start(self):
+        self.job_queue.requeue_stale()
+        for thread in self.threads:
+            thread.start()
+        return self
+
+    def stop(self):
+        self._stop.set()
+
+    def _run(self):
+        while not self._stop.is_set():
+            try:
+                self._run_one()
+            except Exception:
+                # A locked or unavailable database must not kill the worker; try again later
+                logger.exception("Job worker error")
+                self._stop.wait(POLL_INTERVAL)
+
+    def _run_one(self):
+        job = self.job_queue.claim()
+        if job is None:
+            self._stop.wait(POLL_INTERVAL)
+            return
+        job_id = job['id']
+
+        def report(stage, progress):
+            self.job_queue.update(job_id, stage=stage, progress=progress)
+
+        try:
+            results = process_email(job['email'], self.signature_image, report=report, store=self.store)
+            self.job_queue.update(job_id, status=DONE, stage='done', progress=1.0, results=results)
+        except Exception as e:
+            self.job_queue.update(job_id, status=FAILED, stage='failed', error=str(e))
@@ -0,0 +1,120 @@
+import os
+import time
+import random
+import logging
+import threading
+import requests
+from requests.adapters import HTTPAdapter
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_BASE_URL = "https://api.openai.com/v1"
+RETRY_STATUS_CODES = {429, 500, 502, 503, 504}
+
+class TokenBucket:
+    """
+    Token bucket that refills continuously at rate_per_minute.
+    acquire() blocks until enough capacity is available.
+    """
+
+    def __init__(self, rate_per_minute):
+        self.capacity = float(rate_per_minute)
+        self.tokens = float(rate_per_minute)
+        self.rate = rate_per_minute / 60.0
+        self.updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def acquire(self, amount=1):
+        # A single request bigger than the bucket would otherwise wait forever
+        amount = min(float(amount), self.capacity)
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+                self.updated = now
+                if self.tokens >= amount:
+                    self.tokens -= amount
+                    return
+                wait = (amount - self.tokens) / self.rate
+            time.sleep(wait)
+
+class CompletionsClient:
+    """
+    Shared HTTP client for the chat-completions endpoint.
+    Keeps connections alive, limits requests and tokens per minute on the client side and
+    retries 429/5xx responses with jittered exponential backoff, honoring Retry-After.
+    """
+
+    def __init__(self, api_key, base_url=DEFAULT_BASE_URL, timeout=60, max_retries=5,
+                 requests_per_minute=500, tokens_per_minute=30000, pool_size=10):
+        self.api_key = api_key
+        self.base_url = base_url.rstrip('/')
+        self.timeout = timeout
+        self.max_retries = max_retries
+        self.request_limiter = TokenBucket(requests_per_minute)
+        self.token_limiter = TokenBucket(tokens_per_minute)
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size)
+        self.session.mount('https://', adapter)
+        self.session.mount('http://', adapter)
+        self.session.headers.update({
+            'Content-Type': 'application/json',
+            'Authorization': f'Bearer {api_key}',
+        })
+
+    def _backoff(self, attempt, response=None):
+        """
+        Seconds to wait before the next attempt.
+        """
+        if response is not None:
+            retry_after = response.headers.get('Retry-After')
+            if retry_after:
+                try:
+                    return float(retry_after)
+                except ValueError:
+                    pass
+        return min(30.0, 2 ** attempt) * random.uniform(0.5, 1.0)
+
+    def create(self, data, estimated_tokens=0):
+        """
+        Posts a completion request and returns the final requests.Response.
+        Transient failures are retried; the last response is returned if they never clear up.
+        """
+        url = f"{self.base_url}/chat/completions"
+        estimated_tokens += data.get('max_tokens', 0)
+        for attempt in range(self.max_retries + 1):
+            self.request_limiter.acquire()
+            self.token_limiter.acquire(estimated_tokens)
+            try:
+                response = self.session.post(url, json=data, timeout=self.timeout)
+            except (requests.ConnectionError, requests.Timeout):
+                if attempt == self.max_retries:
+                    raise
+                time.sleep(self._backoff(attempt))
+                continue
+            if response.status_code not in RETRY_STATUS_CODES or attempt == self.max_retries:
+                return response
+            logger.warning("Completion request returned %s, retrying (attempt %d).", response.status_code, attempt + 1)
+            time.sleep(self._backoff(attempt, response))
+        return response
+
+_client = None
+_client_lock = threading.Lock()
+
+def get_client(api_key):
+    """
+    Returns the process-wide CompletionsClient, creating it on first use.
+    OPENAI_BASE_URL, OPENAI_TIMEOUT, OPENAI_RPM and OPENAI_TPM in the environment
+    override the defaults, e.g. to point at a local stub server.
+    """
+    global _client
+    with _client_lock:
+        if _client is None or _client.api_key != api_key:
+            _client = CompletionsClient(
+                api_key,
+                base_url=os.getenv('OPENAI_BASE_URL', DEFAULT_BASE_URL),
+                timeout=float(os.getenv('OPENAI_TIMEOUT', 60)),
+                requests_per_minute=float(os.getenv('OPENAI_RPM', 500)),
+                tokens_per_minute=float(os.getenv('OPENAI_TPM', 30000)),
+            )
+        return _client
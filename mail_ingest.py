@@ -0,0 +1,199 @@
+import os
+import sys
+import json
+import base64
+import logging
+import mailbox
+import argparse
+import threading
+from email import policy
+from email.parser import BytesParser
+from attachments import pdf_filename, MAX_ATTACHMENT_BYTES
+from email_context import KEY_HEADERS, TEXT_MIME_TYPES
+
+logger = logging.getLogger(__name__)
+
+FORMATS = ('mbox', 'maildir', 'eml')
+MAILDIR_SUBDIRS = ('cur', 'new', 'tmp')
+
+class Checkpoint:
+    """
+    Append-only record of the messages a backfill has finished, one JSON line per key.
+    Keys are only added, so a crash loses at most the line being written, and a
+    resumed run skips everything recorded here.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self._lock = threading.Lock()
+        self._done = set()
+        if os.path.exists(path):
+            with open(path, 'r') as f:
+                for line in f:
+                    try:
+                        self._done.add(json.loads(line))
+                    except ValueError:
+                        continue  # Torn last line of an interrupted run
+        else:
+            os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+
+    def __contains__(self, key):
+        return key in self._done
+
+    def __len__(self):
+        return len(self._done)
+
+    def mark(self, key):
+        with self._lock:
+            if key in self._done:
+                return
+            with open(self.path, 'a') as f:
+                f.write(json.dumps(key) + '\n')
+            self._done.add(key)
+
+def detect_format(path):
+    """
+    Guesses the mailbox format: a file is an mbox (or a single .eml), a directory with
+    cur/new/tmp is a Maildir and any other directory is read as a folder of .eml files.
+    """
+    if os.path.isfile(path):
+        return 'eml' if path.lower().endswith('.eml') else 'mbox'
+    if os.path.isdir(path):
+        if all(os.path.isdir(os.path.join(path, sub)) for sub in MAILDIR_SUBDIRS):
+            return 'maildir'
+        return 'eml'
+    raise FileNotFoundError(f"Mailbox `{path}` not found.")
+
+def _eml_paths(path):
+    if os.path.isfile(path):
+        yield path
+        return
+    for root, dirs, files in os.walk(path):
+        dirs.sort()
+        for filename in sorted(files):
+            if filename.lower().endswith('.eml'):
+                yield os.path.join(root, filename)
+
+def iter_raw_messages(path, fmt=None):
+    """
+    Yields (key, raw bytes) for every message, reading one message at a time.
+    Keys are stable across runs: the message number in an mbox (mboxes are only ever
+    appended to), the unique file name in a Maildir and the relative path of an .eml.
+    """
+    fmt = fmt or detect_format(path)
+    if fmt not in FORMATS:
+        raise ValueError(f"Unknown mailbox format {fmt!r}, expected one of {FORMATS}")
+    if fmt == 'eml':
+        base = path if os.path.isdir(path) else os.path.dirname(path)
+        for eml_path in _eml_paths(path):
+            with open(eml_path, 'rb') as f:
+                yield os.path.relpath(eml_path, base), f.read()
+        return
+
+    # Only the table of contents (offsets or file names) is kept in memory
+    box = mailbox.mbox(path, create=False) if fmt == 'mbox' else mailbox.Maildir(path, factory=None, create=False)
+    try:
+        keys = box.keys() if fmt == 'mbox' else sorted(box.keys())
+        for key in keys:
+            try:
+                raw = box.get_bytes(key)
+            except KeyError:
+                continue  # Maildir message moved or deleted since the listing
+            yield str(key), raw
+    finally:
+        box.close()
+
+def _text(part):
+    try:
+        return part.get_content()
+    except (LookupError, ValueError):
+        # Unknown or wrong charset
+        payload = part.get_payload(decode=True) or b''
+        return payload.decode('utf-8', errors='replace')
+
+def message_to_email_data(message):
+    """
+    Converts a parsed message into the email JSON shape front.py and build_email_context
+    use: the headers plus the inline text parts, with bodies base64-encoded like Gmail's.
+    Attachments are left out.
+    """
+    headers = [{'name': name, 'value': str(message[name])} for name in KEY_HEADERS if message[name] is not None]
+    parts = []
+    for part in message.walk():
+        if part.is_multipart() or part.is_attachment():
+            continue
+        mime_type = part.get_content_type()
+        if mime_type not in TEXT_MIME_TYPES:
+            continue
+        data = base64.urlsafe_b64encode(_text(part).encode('utf-8')).decode('ascii')
+        parts.append({'mimeType': mime_type, 'body': {'data': data}})
+    return {'payload': {'mimeType': message.get_content_type(), 'headers': headers, 'parts': parts}}
+
+def pdf_attachments(message, max_bytes=MAX_ATTACHMENT_BYTES):
+    """
+    Returns (filename, bytes) for every PDF attachment of the message.
+    Attachments over max_bytes are skipped with a warning.
+    """
+    found = []
+    for part in message.walk():
+        if part.is_multipart():
+            continue
+        filename = part.get_filename()
+        is_pdf = part.get_content_type() == 'application/pdf' or (filename or '').lower().endswith('.pdf')
+        if not is_pdf:
+            continue
+        data = part.get_payload(decode=True)
+        if not data:
+            continue
+        filename = pdf_filename({'filename': filename})
+        if len(data) > max_bytes:
+            logger.warning("Skipping %s: %d bytes, over the %d byte limit.", filename, len(data), max_bytes)
+            continue
+        found.append((filename, data))
+    return found
+
+def iter_mailbox(path, checkpoint=None, fmt=None, max_bytes=MAX_ATTACHMENT_BYTES):
+    """
+    Streams a mbox, Maildir or .eml folder and yields (key, email_data, attachments) for
+    every message with PDF attachments; attachments is a list of (filename, bytes).
+    Messages are parsed one at a time, so memory stays bounded by the largest message.
+    Keys already in the checkpoint are skipped. The caller marks a key once its
+    attachments are done; messages without PDFs (or that can't be parsed) are marked here.
+    """
+    parser = BytesParser(policy=policy.default)
+    for key, raw in iter_raw_messages(path, fmt):
+        if checkpoint is not None and key in checkpoint:
+            continue
+        try:
+            message = parser.parsebytes(raw)
+            attachments = pdf_attachments(message, max_bytes)
+            email_data = message_to_email_data(message) if attachments else None
+        except Exception as e:
+            logger.warning("Skipping unreadable message %s: %s", key, e)
+            attachments = []
+        del raw
+        if not attachments:
+            if checkpoint is not None:
+                checkpoint.mark(key)
+            continue
+        yield key, email_data, attachments
+
+def main():
+    parser = argparse.ArgumentParser(description="Fill and sign the PDF attachments of every message in a mailbox.")
+    parser.add_argument('mailbox', help='mbox file, Maildir or folder of .eml files')
+    parser.add_argument('--checkpoint', help='Checkpoint file; defaults to one per mailbox in the attachment store')
+    parser.add_argument('--signature', default='signature.png')
+    parser.add_argument('--workers', type=int, default=4)
+    args = parser.parse_args()
+
+    from jobs import process_mailbox
+    processed = failed = 0
+    for key, results in process_mailbox(args.mailbox, args.signature, args.checkpoint, args.workers):
+        processed += 1
+        failed += any(result['error'] for result in results)
+    logger.info("Processed %d messages, %d with errors.", processed, failed)
+    return 1 if failed else 0
+
+if __name__ == '__main__':
+    logging.basicConfig(level=os.getenv('AUTOFILL_LOG_LEVEL', 'INFO'), format='%(message)s')
+    sys.exit(main())
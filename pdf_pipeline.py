@@ -0,0 +1,116 @@
+import os
+import logging
+import fitz  # PyMuPDF
+from sign import find_signature_rects, stamp_signature, is_signature_field
+from pdf_utils import widget_field_info, pdf_output, report_size, INCREMENTAL_SAVE, FULL_SAVE_OPTIONS
+from instrumentation import span
+
+logger = logging.getLogger(__name__)
+
+CHECKED_VALUES = {'yes', 'on', 'true', '1', 'x', 'checked'}
+
+def open_pdf(pdf):
+    """
+    Opens a PDF given either as raw bytes or as a file path.
+    """
+    if isinstance(pdf, (bytes, bytearray)):
+        return fitz.open(stream=bytes(pdf), filetype='pdf')
+    return fitz.open(pdf)
+
+def _pdf_name(value):
+    # Characters outside the regular printable range are written as #xx escapes
+    return '/' + ''.join(ch if 33 <= ord(ch) <= 126 and ch not in '()<>[]{}/%#' else f"#{ord(ch):02x}"
+                         for ch in str(value))
+
+def fill_widgets(doc, form_data):
+    """
+    Writes form_data into the document's widgets, matched by fully qualified field name.
+    Text and choice values are written straight into the field dictionaries and their
+    appearance streams dropped, so bake() regenerates them in one go; buttons go through
+    the slower Widget API because their on-state has to be looked up.
+    Returns the number of widgets that were filled.
+    """
+    filled = 0
+    for page in doc:
+        buttons = []
+        for xref, annot_type, _ in page.annot_xrefs():
+            if annot_type != fitz.PDF_ANNOT_WIDGET:
+                continue
+            name, field_type, field_xref = widget_field_info(doc, xref)
+            if name not in form_data or is_signature_field(name, field_type):
+                # The signature image goes there, not the model's text
+                continue
+            value = form_data[name]
+            if field_type == '/Btn':
+                buttons.append((xref, value))
+                continue
+            if isinstance(value, list) and field_type == '/Ch':
+                # MultiSelect lists take an array of the selected options
+                pdf_value = '[' + ''.join(fitz.get_pdf_str(str(v)) for v in value) + ']'
+            elif isinstance(value, list):
+                pdf_value = fitz.get_pdf_str(', '.join(str(v) for v in value))
+            else:
+                pdf_value = fitz.get_pdf_str(str(value))
+            doc.xref_set_key(field_xref or xref, 'V', pdf_value)
+            doc.xref_set_key(xref, 'AP', 'null')
+            filled += 1
+
+        for xref, value in buttons:
+            widget = page.load_widget(xref)
+            on_state = widget.on_state()
+            if widget.field_type == fitz.PDF_WIDGET_TYPE_RADIOBUTTON:
+                # Each kid of a radio group has its own on-state; only the one that
+                # matches the answer is switched on, the group /V names it
+                selected = str(value).lstrip('/') == str(on_state)
+                doc.xref_set_key(xref, 'AS', _pdf_name(on_state) if selected else '/Off')
+                if selected:
+                    _, _, field_xref = widget_field_info(doc, xref)
+                    doc.xref_set_key(field_xref or xref, 'V', _pdf_name(on_state))
+                filled += 1
+                continue
+            if str(value).strip().lower() in CHECKED_VALUES or str(value).lstrip('/') == str(on_state):
+                widget.field_value = on_state
+            else:
+                widget.field_value = 'Off'
+            widget.update()
+            filled += 1
+    return filled
+
+def fill_flatten_sign(pdf, form_data, signature_image, output_path=None, incremental=INCREMENTAL_SAVE):
+    """
+    Fills, flattens and signs a PDF in one in-memory pass.
+    pdf may be bytes or a path. Returns the signed PDF as bytes, or writes it to
+    output_path and returns the path when one is given. With incremental set, the
+    changes are appended to a copy of the input rather than rewriting every object.
+    """
+    document = pdf if isinstance(pdf, str) else '<bytes>'
+    if output_path:
+        with pdf_output(pdf, output_path, incremental) as doc:
+            _fill_flatten_sign(doc, form_data, signature_image, document)
+        logger.info("Filled and signed PDF saved as %s", output_path)
+        return output_path
+
+    doc = open_pdf(pdf)
+    try:
+        _fill_flatten_sign(doc, form_data, signature_image, document)
+        with span('save', document=document):
+            output = doc.tobytes(**FULL_SAVE_OPTIONS)
+        report_size(document, len(pdf) if isinstance(pdf, (bytes, bytearray)) else os.path.getsize(pdf), len(output))
+        return output
+    finally:
+        doc.close()
+
+def _fill_flatten_sign(doc, form_data, signature_image, document):
+    # Signature widgets disappear when flattening, so locate them first
+    with span('sign', document=document):
+        placements = find_signature_rects(doc)
+
+    with span('fill', document=document):
+        fill_widgets(doc, form_data)
+
+    # Turn the widgets into regular page content, like fillpdfs.flatten_pdf
+    with span('flatten', document=document):
+        doc.bake(annots=False, widgets=True)
+
+    with span('sign', document=document):
+        stamp_signature(doc, placements, signature_image)
@@ -0,0 +1,261 @@
+import os
+import re
+import shutil
+import logging
+import subprocess
+import threading
+from contextlib import contextmanager
+import fitz  # PyMuPDF
+from instrumentation import span, count
+
+logger = logging.getLogger(__name__)
+
+# Append changes to a copy of the input instead of rewriting the whole file; set
+# AUTOFILL_INCREMENTAL_SAVE=0 to always do a full save
+INCREMENTAL_SAVE = os.getenv('AUTOFILL_INCREMENTAL_SAVE', '1') != '0'
+FULL_SAVE_OPTIONS = {'garbage': 1, 'deflate': True}  # Used when an incremental save isn't possible
+# Only new or changed streams are written on an incremental save, so deflating them is cheap
+INCREMENTAL_SAVE_OPTIONS = {'incremental': True, 'encryption': fitz.PDF_ENCRYPT_KEEP, 'deflate': True}
+# Set AUTOFILL_OPTIMIZE_OUTPUT=1 for a compacting full rewrite instead: duplicate objects are
+# merged, unused ones dropped and every stream compressed. AUTOFILL_LINEARIZE_OUTPUT=1 also
+# linearizes the file so viewers can show the first page before the download finishes.
+OPTIMIZE_OUTPUT = os.getenv('AUTOFILL_OPTIMIZE_OUTPUT', '0') == '1'
+LINEARIZE_OUTPUT = os.getenv('AUTOFILL_LINEARIZE_OUTPUT', '0') == '1'
+MUPDF_WITHOUT_LINEARIZATION = (1, 25)  # First MuPDF version that refuses to write linearized files
+OPTIMIZE_SAVE_OPTIONS = {'garbage': 3, 'deflate': True, 'deflate_images': True, 'deflate_fonts': True}
+MAX_FIELD_DEPTH = 32  # Deeper /Kids or /Parent nesting is treated as broken
+
+def widget_field_info(doc, xref):
+    """
+    Returns the fully qualified name, field type and field xref for a widget annotation.
+    Only reads the few keys needed, which is much cheaper than loading a fitz.Widget.
+    """
+    parts = []
+    field_type = None
+    field_xref = None
+    seen = set()
+    # A /Parent chain that loops back on itself is cut where it repeats
+    while xref and xref not in seen and len(seen) <= MAX_FIELD_DEPTH:
+        seen.add(xref)
+        kind, value = doc.xref_get_key(xref, 'T')
+        if kind == 'string':
+            parts.append(value)
+            field_xref = field_xref or xref
+        if field_type is None:
+            kind, value = doc.xref_get_key(xref, 'FT')
+            if kind == 'name':
+                field_type = value
+        kind, value = doc.xref_get_key(xref, 'Parent')
+        xref = int(value.split()[0]) if kind == 'xref' else 0
+    return '.'.join(reversed(parts)), field_type, field_xref
+
+def widget_rect(doc, page, xref):
+    """
+    Returns the widget's rectangle in PyMuPDF page coordinates.
+    """
+    kind, value = doc.xref_get_key(xref, 'Rect')
+    if kind != 'array':
+        return None
+    coords = [float(v) for v in value.strip('[]').split()]
+    return fitz.Rect(coords) * page.transformation_matrix
+
+def copy_file(source, target):
+    """
+    Copies a file with copy_file_range, which lets filesystems that support it share
+    the data blocks instead of duplicating them. Falls back to a regular copy.
+    """
+    try:
+        with open(source, 'rb') as src, open(target, 'wb') as dst:
+            remaining = os.fstat(src.fileno()).st_size
+            while remaining > 0:
+                copied = os.copy_file_range(src.fileno(), dst.fileno(), remaining)
+                if copied == 0:
+                    break
+                remaining -= copied
+        if remaining <= 0:
+            return
+    except (AttributeError, OSError):
+        pass
+    shutil.copyfile(source, target)
+
+def _source_size(source):
+    return os.path.getsize(source) if isinstance(source, (str, os.PathLike)) else len(source)
+
+def report_size(document, before, after):
+    """
+    Logs and counts the size of an output next to the size of its input.
+    """
+    count('output_bytes_in', before)
+    count('output_bytes_out', after)
+    logger.info("%s: %d bytes in, %d bytes out (%+.1f%%).", document, before, after,
+                100.0 * (after - before) / before if before else 0.0)
+
+def linearize_file(path):
+    """
+    Linearizes a saved PDF in place with qpdf, since MuPDF 1.25+ no longer writes
+    linearized files. Returns False if qpdf isn't installed or fails.
+    """
+    qpdf = shutil.which('qpdf')
+    if not qpdf:
+        return False
+    tmp_path = f"{path}.linear"
+    try:
+        subprocess.run([qpdf, '--linearize', path, tmp_path], check=True, capture_output=True)
+        os.replace(tmp_path, path)
+        return True
+    except (OSError, subprocess.CalledProcessError) as e:
+        logger.warning("qpdf couldn't linearize %s: %s", path, e)
+        return False
+    finally:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+
+def save_full(doc, path, options=FULL_SAVE_OPTIONS, linearize=False):
+    """
+    Writes the whole document to path, linearized if asked and possible.
+    Returns whether the file is linearized.
+    """
+    if linearize and fitz.mupdf_version_tuple < MUPDF_WITHOUT_LINEARIZATION:
+        doc.save(path, linear=True, **options)
+        return True
+    doc.save(path, **options)
+    return linearize and linearize_file(path)
+
+@contextmanager
+def pdf_output(source, output_path, incremental=INCREMENTAL_SAVE, optimize=OPTIMIZE_OUTPUT,
+               linearize=LINEARIZE_OUTPUT):
+    """
+    Opens source (a path or bytes) for changes that are written to output_path on exit.
+
+        with pdf_output('in.pdf', 'out.pdf') as doc:
+            ...
+
+    When source is a file, it is copied next to the output and the changes are appended
+    to the copy as an incremental update, so unchanged objects are never rewritten.
+    Documents that can't be updated that way (bytes input, repaired or encrypted files)
+    get a full save with garbage collection and deflate. optimize and linearize always
+    rewrite the whole file, see OPTIMIZE_SAVE_OPTIONS. The output is written under a
+    temp name and moved into place, since concurrent jobs may produce the same file.
+    """
+    tmp_path = f"{output_path}.{os.getpid()}.{threading.get_ident()}.tmp"
+    full_path = f"{tmp_path}.full"
+    is_file = isinstance(source, (str, os.PathLike))
+    document = str(source) if is_file else '<bytes>'
+    before = _source_size(source)
+    incremental = incremental and is_file and not (optimize or linearize)
+    try:
+        if incremental:
+            copy_file(source, tmp_path)
+            doc = fitz.open(tmp_path)
+        elif is_file:
+            doc = fitz.open(source)
+        else:
+            doc = fitz.open(stream=bytes(source), filetype='pdf')
+        try:
+            yield doc
+            with span('save', document=document):
+                if incremental and doc.can_save_incrementally():
+                    doc.save(tmp_path, **INCREMENTAL_SAVE_OPTIONS)
+                    count('incremental_saves')
+                else:
+                    if incremental:
+                        logger.debug("Can't update %s incrementally, doing a full save.", document)
+                    options = OPTIMIZE_SAVE_OPTIONS if optimize else FULL_SAVE_OPTIONS
+                    if not save_full(doc, full_path, options, linearize) and linearize:
+                        logger.warning("Linearizing needs qpdf with this MuPDF version, %s is not linearized.", output_path)
+                    os.replace(full_path, tmp_path)
+                    count('full_saves')
+        finally:
+            doc.close()
+        os.replace(tmp_path, output_path)
+    finally:
+        for path in (tmp_path, full_path):
+            if os.path.exists(path):
+                os.remove(path)
+    report_size(output_path, before, os.path.getsize(output_path))
+
+def optimize_pdf(input_path, output_path=None, linearize=LINEARIZE_OUTPUT):
+    """
+    Rewrites a finished PDF compactly (see OPTIMIZE_SAVE_OPTIONS), in place unless
+    output_path is given. Returns (bytes before, bytes after).
+    """
+    before = os.path.getsize(input_path)
+    with pdf_output(input_path, output_path or input_path, optimize=True, linearize=linearize):
+        pass
+    return before, os.path.getsize(output_path or input_path)
+
+class PdfName(str):
+    """
+    A PDF name such as /Tx, kept apart from text strings. The value includes the slash.
+    """
+
+class PdfRef(int):
+    """
+    An indirect reference (the object's xref number).
+    """
+
+PDF_TOKEN = re.compile(
+    r'\s*(?:(<<|>>|\[|\])'
+    r'|(/[^\s/<>\[\]()]*)'
+    r'|\(((?:[^()\\]|\\.)*)\)'
+    r'|<([0-9A-Fa-f\s]*)>'
+    r'|(\d+)\s+\d+\s+R'
+    r'|([-+]?(?:\d+\.?\d*|\.\d+))'
+    r'|(true|false|null))',
+    re.DOTALL,
+)
+STRING_ESCAPE = re.compile(r'\\([0-7]{1,3}|\r\n|.)', re.DOTALL)
+STRING_ESCAPES = {'n': '\n', 'r': '\r', 't': '\t', 'b': '\b', 'f': '\f', '\r\n': '', '\n': '', '\r': ''}
+HEX_NAME_ESCAPE = re.compile(r'#([0-9A-Fa-f]{2})')
+KEYWORDS = {'true': True, 'false': False, 'null': None}
+
+def _hex_char(match):
+    return chr(int(match.group(1), 16))
+
+def _decode_text(data):
+    if data[:2] == b'\xfe\xff':
+        return data[2:].decode('utf-16-be', errors='replace')
+    if data[:3] == b'\xef\xbb\xbf':
+        return data[3:].decode('utf-8', errors='replace')
+    # PDFDocEncoding matches Latin-1 for the characters forms normally use
+    return data.decode('latin-1')
+
+def _literal_string(body):
+    def unescape(match):
+        escape = match.group(1)
+        if escape[0] in '01234567':
+            return chr(int(escape, 8) & 0xFF)
+        return STRING_ESCAPES.get(escape, escape)
+    return _decode_text(STRING_ESCAPE.sub(unescape, body).encode('latin-1', errors='replace'))
+
+def parse_pdf_object(source):
+    """
+    Parses the text of a PDF object as printed by MuPDF (doc.xref_object) into Python
+    values: dicts, lists, str, PdfName, PdfRef, int, float, bool and None. Reading a
+    whole object this way is several times cheaper than one xref_get_key call per key.
+    """
+    stack = [[]]
+    for match in PDF_TOKEN.finditer(source):
+        kind = match.lastindex
+        token = match.group(kind)
+        if kind == 1:
+            if token in ('<<', '['):
+                stack.append([])
+                continue
+            items = stack.pop()
+            value = dict(zip(items[::2], items[1::2])) if token == '>>' else items
+        elif kind == 2:
+            value = PdfName(HEX_NAME_ESCAPE.sub(_hex_char, token) if '#' in token else token)
+        elif kind == 3:
+            value = _literal_string(token) if '\\' in token else token
+        elif kind == 4:
+            digits = re.sub(r'\s', '', token)
+            value = _decode_text(bytes.fromhex(digits + '0' * (len(digits) % 2)))
+        elif kind == 5:
+            value = PdfRef(token)
+        elif kind == 6:
+            value = float(token) if '.' in token else int(token)
+        else:
+            value = KEYWORDS[token]
+        stack[-1].append(value)
+    return stack[0][0] if stack and stack[0] else None
@@ -0,0 +1,90 @@
+import os
+import threading
+import fitz  # PyMuPDF
+from cache import CACHE_DIR
+from store import file_sha256
+
+PREVIEW_DIR = os.path.join(CACHE_DIR, 'previews')
+PREVIEW_DPI = 40  # Low resolution, only meant for recognising the page
+PAGES_PER_VIEW = 4  # Thumbnails shown at once
+MAX_PREVIEW_BYTES = 200 * 1024 * 1024  # Oldest thumbnails are evicted beyond this
+
+_hash_cache = {}  # (path, size, mtime) -> sha256, so reruns don't rehash the output
+_lock = threading.Lock()
+
+def _output_hash(pdf_path):
+    stat = os.stat(pdf_path)
+    key = (os.path.abspath(pdf_path), stat.st_size, stat.st_mtime_ns)
+    with _lock:
+        sha = _hash_cache.get(key)
+    if sha is None:
+        sha = file_sha256(pdf_path)
+        with _lock:
+            _hash_cache[key] = sha
+    return sha
+
+def page_count(pdf_path):
+    with fitz.open(pdf_path) as doc:
+        return len(doc)
+
+def thumbnails(pdf_path, first_page=0, count=PAGES_PER_VIEW, dpi=PREVIEW_DPI):
+    """
+    Returns PNG paths for pages first_page .. first_page + count - 1 of the PDF.
+    Pages are rendered on demand and cached by the hash of the PDF, so each page of
+    each output is rendered at most once.
+    """
+    sha = _output_hash(pdf_path)
+    directory = os.path.join(PREVIEW_DIR, sha[:2], sha)
+    os.makedirs(directory, exist_ok=True)
+
+    paths = []
+    doc = None
+    try:
+        total = None
+        for page_number in range(first_page, first_page + count):
+            path = os.path.join(directory, f"{page_number}_{dpi}.png")
+            if os.path.exists(path):
+                # Refresh the timestamp so eviction treats it as recently used
+                os.utime(path)
+                paths.append(path)
+                continue
+            if doc is None:
+                doc = fitz.open(pdf_path)
+                total = len(doc)
+            if page_number >= total:
+                break
+            tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+            doc[page_number].get_pixmap(dpi=dpi).save(tmp_path, output='png')
+            os.replace(tmp_path, path)
+            paths.append(path)
+    finally:
+        if doc is not None:
+            doc.close()
+            evict()
+    return paths
+
+def evict(max_bytes=MAX_PREVIEW_BYTES):
+    """
+    Deletes the least recently used thumbnails until the cache is under max_bytes.
+    """
+    entries = []
+    total = 0
+    for root, _, files in os.walk(PREVIEW_DIR):
+        for name in files:
+            path = os.path.join(root, name)
+            try:
+                stat = os.stat(path)
+            except OSError:
+                continue
+            entries.append((stat.st_mtime, stat.st_size, path))
+            total += stat.st_size
+    if total <= max_bytes:
+        return
+    for _, size, path in sorted(entries):
+        try:
+            os.remove(path)
+        except OSError:
+            continue
+        total -= size
+        if total <= max_bytes:
+            break
@@ -0,0 +1,127 @@
+import re
+import datetime
+from email.utils import parseaddr
+
+DATE_FORMAT = '%m/%d/%Y'  # How locally resolved dates are written into the form
+MIN_CONFIDENCE = 0.75  # Fields resolved with less confidence than this still go to ChatGPT
+
+# Field-name patterns, matched against the lowercase words of the last part of the name
+# ('applicant.emailAddress' -> 'email address'), mapped to a fact slot and a confidence
+FIELD_PATTERNS = [
+    ('date', re.compile(r'^(todays? )?date$|^(date )?signed( date| on)?$|^date of signature$|^signature date$|^dated$'), 0.9),
+    ('email', re.compile(r'^(your |sender |contact )?e ?mail( address)?$'), 0.9),
+    ('full_name', re.compile(r'^(your |full |printed |print |signer |sender )?name$|^name of signer$'), 0.8),
+    ('first_name', re.compile(r'^(first|given) name$|^fname$'), 0.85),
+    ('last_name', re.compile(r'^(last|family|sur) ?name$|^lname$'), 0.85),
+    ('phone', re.compile(r'^(phone|telephone|tel|mobile|cell)( number| no)?$'), 0.85),
+    ('address', re.compile(r'^(your |home |mailing |street |postal )?address( line 1| 1)?$|^street$'), 0.85),
+]
+
+DEFAULT_VALUE_CONFIDENCE = 0.9  # Field has a /DV default
+SINGLE_OPTION_CONFIDENCE = 0.95  # Checkbox or choice field with exactly one option
+
+EMAIL_PATTERN = re.compile(r'[\w.+-]+@[\w-]+(?:\.[\w-]+)+')
+PHONE_PATTERN = re.compile(r'(?<!\d)(?:\+?1[\s.-]?)?\(?\d{3}\)?[\s.-]?\d{3}[\s.-]?\d{4}(?!\d)')
+STREET_ADDRESS = re.compile(
+    r'\b\d{1,6} (?:[A-Z][A-Za-z.]* ){1,4}(?:Street|St|Avenue|Ave|Road|Rd|Boulevard|Blvd|Lane|Ln|Drive|Dr|'
+    r'Court|Ct|Way|Place|Pl|Terrace|Parkway|Pkwy)\b\.?(?:,? (?:Apt|Suite|Unit) ?#?\w+)?'
+    r'(?:, ?[A-Z][A-Za-z .]+, ?[A-Z]{2} \d{5}(?:-\d{4})?)?')
+FROM_HEADER = re.compile(r'^From:\s*(.+)$', re.MULTILINE)
+NAME_SEGMENT_SPLIT = re.compile(r'::|\.')
+CAMEL_CASE = re.compile(r'([a-z])([A-Z])')
+WORD_SPLIT = re.compile(r'[^A-Za-z0-9]+|(?<=[A-Za-z])(?=\d)')
+
+def _name_words(name):
+    """
+    Lowercase words of the last segment of a field name, without numbering.
+    'form0::Date1' -> 'date', 'applicant.firstName' -> 'first name'.
+    """
+    last = NAME_SEGMENT_SPLIT.split(str(name))[-1]
+    spaced = CAMEL_CASE.sub(r'\1 \2', last)
+    words = [w for w in WORD_SPLIT.split(spaced.lower()) if w and not w.isdigit()]
+    return ' '.join(words)
+
+def extract_facts(additional_text, today=None):
+    """
+    Pulls values the resolver can use out of the email context: today's date, the
+    sender's name and address from the From header, and a phone number or street address
+    if the text mentions exactly one. Returns {slot: (value, confidence)}.
+    """
+    text = additional_text or ''
+    facts = {'date': ((today or datetime.date.today()).strftime(DATE_FORMAT), 1.0)}
+
+    header = FROM_HEADER.search(text)
+    if header:
+        name, address = parseaddr(header.group(1))
+        if address and '@' in address:
+            facts['email'] = (address, 1.0)
+        name = name.strip().strip('"')
+        if name and '@' not in name:
+            facts['full_name'] = (name, 1.0)
+            parts = name.split()
+            if len(parts) >= 2:
+                facts['first_name'] = (parts[0], 0.9)
+                facts['last_name'] = (parts[-1], 0.9)
+    if 'email' not in facts:
+        addresses = set(EMAIL_PATTERN.findall(text))
+        if len(addresses) == 1:
+            # An address in the body may well belong to someone else
+            facts['email'] = (addresses.pop(), 0.7)
+
+    addresses = set(STREET_ADDRESS.findall(text))
+    if len(addresses) == 1:
+        facts['address'] = (addresses.pop(), 0.85)
+
+    phones = {re.sub(r'\D', '', phone)[-10:]: phone.strip() for phone in PHONE_PATTERN.findall(text)}
+    if len(phones) == 1:
+        facts['phone'] = (next(iter(phones.values())), 0.9)
+    return facts
+
+def _default_value(field):
+    """
+    The field's /DV, or None if it doesn't say anything: blank, or an unchecked button.
+    """
+    default = field.get('default_value')
+    if default is None or not str(default).strip() or default == []:
+        return None
+    if field.get('type') == '/Btn' and str(default).lstrip('/') == 'Off':
+        return None
+    return default
+
+def resolve_field(field, facts):
+    """
+    Returns (value, confidence, source) for one field, or None if nothing matched.
+    """
+    options = field.get('options') or []
+    default = _default_value(field)
+    if default is not None:
+        return default, DEFAULT_VALUE_CONFIDENCE, 'default'
+    if field.get('type') in ('/Btn', '/Ch') and len(options) == 1:
+        return options[0], SINGLE_OPTION_CONFIDENCE, 'single_option'
+
+    words = _name_words(field.get('name', ''))
+    for slot, pattern, confidence in FIELD_PATTERNS:
+        if slot in facts and pattern.search(words):
+            value, fact_confidence = facts[slot]
+            return value, confidence * fact_confidence, slot
+    return None
+
+def resolve_fields(field_list, additional_text=None, min_confidence=MIN_CONFIDENCE, today=None):
+    """
+    Fills what can be answered without a model.
+    Returns (resolved, leftover): resolved maps field names to dicts with 'value',
+    'confidence' and 'source'; leftover is the part of field_list that still needs ChatGPT.
+    """
+    facts = extract_facts(additional_text, today)
+    resolved, leftover = {}, []
+    for field in field_list:
+        name = field.get('name')
+        match = resolve_field(field, facts) if name else None
+        if match:
+            value, confidence, source = match
+            too_long = field.get('max_length') and len(str(value)) > field['max_length']
+            if confidence >= min_confidence and not too_long:
+                resolved[name] = {'value': value, 'confidence': round(confidence, 3), 'source': source}
+                continue
+        leftover.append(field)
+    return resolved, leftover
@@ -1,54 +1,146 @@
+import os
+import re
+import math
+import logging
+import functools
 import fitz  # PyMuPDF
+from pdf_utils import widget_field_info, widget_rect, pdf_output, INCREMENTAL_SAVE
+from instrumentation import span
 
-def sign_pdf(input_pdf, output_pdf, signature_image):
-    # Open the PDF document
-    doc = fitz.open(input_pdf)
+logger = logging.getLogger(__name__)
 
-    # Keywords to search for signature fields
-    keywords = ["Signature", "Sign Here", "Authorized Signatory"]
+# Keywords to search for signature fields when the form has no signature widgets
+DEFAULT_KEYWORDS = ["Signature", "Sign Here", "Authorized Signatory"]
 
-    # Iterate over each page in the PDF
-    for page_number in range(len(doc)):
-        page = doc[page_number]
-        found = False  # Flag to check if a keyword was found on the page
+# Whole words in a field name that mark a text box as the signature spot, and words that
+# mean it only describes the signer or the signing
+SIGNATURE_WORDS = {'signature', 'signatory', 'sign', 'sig'}
+NOT_SIGNATURE_WORDS = {'date', 'name', 'title', 'print', 'printed', 'signer', 'designation'}
+_LABEL_WORD = re.compile(r'[A-Z]+(?![a-z])|[A-Z]?[a-z]+|[0-9]+')
+
+# Adjust the position and size of the signature image as needed
+IMAGE_WIDTH = 150  # Adjust the width of the signature image
+IMAGE_HEIGHT = 50  # Adjust the height of the signature image
+VERTICAL_ADJUSTMENT = 0  # Adjust this value to fine-tune the position
+SIGNATURE_DPI = 150  # The signature image is downsampled to this resolution at its largest placement
+
+def sign_pdf(input_pdf, output_pdf, signature_image, keywords=None, incremental=INCREMENTAL_SAVE):
+    # Open a copy of the PDF document; only the signature is appended to it when saved
+    with pdf_output(input_pdf, output_pdf, incremental) as doc:
+        with span('sign', document=input_pdf):
+            stamp_signature(doc, find_signature_rects(doc, keywords), signature_image)
+    logger.info("Signature inserted. The signed PDF is saved as '%s'.", output_pdf)
 
-        # Search for each keyword on the page
-        for keyword in keywords:
-            text_instances = page.search_for(keyword)
+def is_signature_field(name, field_type):
+    """
+    True for /Sig fields and for text boxes labelled as a signature ("Signature",
+    "Sign Here", "applicantSig"). Words are matched whole, so "Designation" and
+    "Assignment" don't count, and "Signature Date" or "Signatory Name" are left alone.
+    """
+    if field_type == '/Sig':
+        return True
+    if field_type != '/Tx' or not name:
+        return False
+    words = {word.lower() for word in _LABEL_WORD.findall(name)}
+    return bool(words & SIGNATURE_WORDS) and not words & NOT_SIGNATURE_WORDS
 
-            # If instances are found, insert the signature image
-            if text_instances:
-                found = True
-                for inst in text_instances:
-                    x0, y0, x1, y1 = inst  # Get the coordinates of the text instance
+def _widget_signature_rects(doc):
+    """
+    Rects of /Sig fields and signature-labelled widgets, as (page_number, rect) pairs.
+    """
+    placements = []
+    if not doc.is_form_pdf:
+        return placements
+    for page in doc:
+        for xref, annot_type, _ in page.annot_xrefs():
+            if annot_type != fitz.PDF_ANNOT_WIDGET:
+                continue
+            name, field_type, _ = widget_field_info(doc, xref)
+            if is_signature_field(name, field_type):
+                rect = widget_rect(doc, page, xref)
+                if rect is not None and not rect.is_empty:
+                    placements.append((page.number, rect))
+    return placements
 
-                    # Adjust the position and size of the signature image as needed
-                    image_width = 150  # Adjust the width of the signature image
-                    image_height = 50  # Adjust the height of the signature image
+def _normalize_word(word):
+    return re.sub(r'[^0-9a-z]', '', word.lower())
 
-                    # Adjust the vertical position
-                    vertical_adjustment = 0  # Adjust this value to fine-tune the position
+def _keyword_signature_rects(doc, keywords):
+    """
+    Finds keyword phrases with a single word extraction per page and returns the
+    image rects next to them, as (page_number, rect) pairs.
+    """
+    phrases = [[_normalize_word(w) for w in keyword.split()] for keyword in keywords]
+    phrases = [phrase for phrase in phrases if all(phrase)]
+    first_words = {phrase[0] for phrase in phrases}
 
-                    # Calculate the average top y coordinate
-                    average_top_y = y1 - (image_height / 2) + vertical_adjustment
+    placements = []
+    for page in doc:
+        words = page.get_text("words")
+        normalized = [_normalize_word(w[4]) for w in words]
+        for i, word in enumerate(normalized):
+            if word not in first_words:
+                continue
+            for phrase in phrases:
+                if normalized[i:i + len(phrase)] != phrase:
+                    continue
+                # Position the image like the old search_for based placement
+                x0, y1 = words[i][0], words[i + len(phrase) - 1][3]
+                average_top_y = y1 - (IMAGE_HEIGHT / 2) + VERTICAL_ADJUSTMENT
+                placements.append((page.number, fitz.Rect(
+                    x0,
+                    average_top_y,
+                    x0 + IMAGE_WIDTH,
+                    average_top_y + IMAGE_HEIGHT
+                )))
+                break
+    return placements
 
-                    # Create the image rectangle
-                    image_rect = fitz.Rect(
-                        x0,
-                        average_top_y,
-                        x0 + image_width,
-                        average_top_y + image_height
-                    )
+def find_signature_rects(doc, keywords=None):
+    """
+    Returns where the signature goes as a list of (page_number, rect) pairs.
+    Signature fields in the AcroForm win; otherwise the page text is searched for keywords.
+    """
+    placements = _widget_signature_rects(doc)
+    if not placements:
+        placements = _keyword_signature_rects(doc, keywords or DEFAULT_KEYWORDS)
+    return placements
 
-                    # Insert the signature image into the PDF
-                    page.insert_image(image_rect, filename=signature_image)
+@functools.lru_cache(maxsize=8)
+def _signature_png(signature_image, mtime, max_width, max_height):
+    pix = fitz.Pixmap(signature_image)
+    scale = min(1.0, max_width / pix.width, max_height / pix.height)
+    if scale < 1.0:
+        pix = fitz.Pixmap(pix, max(1, round(pix.width * scale)), max(1, round(pix.height * scale)), None)
+    return pix.tobytes('png')
 
-        if not found:
-            print(f"No signature field found on page {page_number + 1}.")
+def signature_png(signature_image, placements, dpi=SIGNATURE_DPI):
+    """
+    The signature image as PNG bytes, downsampled to what the largest placement shows at
+    dpi. Prepared images are cached, so a batch decodes and scales the file only once.
+    """
+    max_width = math.ceil(max(rect.width for _, rect in placements) * dpi / 72)
+    max_height = math.ceil(max(rect.height for _, rect in placements) * dpi / 72)
+    return _signature_png(signature_image, os.path.getmtime(signature_image), max_width, max_height)
 
-    # Save the modified PDF to a new file
-    doc.save(output_pdf)
-    print(f"Signature inserted. The signed PDF is saved as '{output_pdf}'.")
+def stamp_signature(doc, placements, signature_image):
+    """
+    Inserts the signature image at each placement. The image is downsampled and embedded
+    once, and every further placement reuses its xref.
+    """
+    image_xref = 0
+    signed_pages = set()
+    for page_number, rect in placements:
+        page = doc[page_number]
+        if image_xref:
+            page.insert_image(rect, xref=image_xref)
+        else:
+            image_xref = page.insert_image(rect, stream=signature_png(signature_image, placements))
+        signed_pages.add(page_number)
+
+    for page_number in range(len(doc)):
+        if page_number not in signed_pages:
+            logger.debug("No signature field found on page %d.", page_number + 1)
 
 # Remove or comment out the main block
 # if __name__ == "__main__":
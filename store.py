@@ -0,0 +1,182 @@
+import os
+import re
+import json
+import time
+import shutil
+import sqlite3
+import hashlib
+import tempfile
+import logging
+import threading
+
+logger = logging.getLogger(__name__)
+
+STORE_DIR = os.path.join('DownloadedPDFs', 'store')  # Default location of the attachment store
+
+# Processing stages recorded in the manifest, in pipeline order
+STAGES = ('extracted', 'answered', 'signed')
+
+def file_sha256(path, chunk_size=1024 * 1024):
+    """
+    Hashes a file in chunks so large attachments never sit in memory.
+    """
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(chunk_size), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+def context_key(additional_text):
+    """
+    Hash of the whitespace-normalized input context the attachment was processed with.
+    """
+    text = re.sub(r'\s+', ' ', additional_text or '').strip()
+    return hashlib.sha256(text.encode('utf-8')).hexdigest()
+
+class AttachmentStore:
+    """
+    Content-addressed attachment store with a processing manifest.
+    Attachments live under objects/ by the SHA-256 of their bytes, so identical files are
+    kept once no matter what they were called. The manifest records which stages are done
+    for each (hash, context) pair so re-runs and crashed batches pick up where they stopped.
+    It is a SQLite database, so any number of store instances, threads and processes can
+    record stages at the same time without overwriting each other.
+    """
+
+    def __init__(self, root=STORE_DIR):
+        self.root = root
+        self.objects_dir = os.path.join(root, 'objects')
+        self.outputs_dir = os.path.join(root, 'outputs')
+        self.manifest_path = os.path.join(root, 'manifest.sqlite3')
+        os.makedirs(self.objects_dir, exist_ok=True)
+        os.makedirs(self.outputs_dir, exist_ok=True)
+        with self._connect() as conn:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS names ("
+                " seq INTEGER PRIMARY KEY AUTOINCREMENT,"
+                " sha TEXT NOT NULL,"
+                " name TEXT NOT NULL,"
+                " UNIQUE (sha, name))"
+            )
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS stages ("
+                " sha TEXT NOT NULL,"
+                " ctx TEXT NOT NULL,"
+                " stage TEXT NOT NULL,"
+                " value TEXT,"
+                " updated REAL NOT NULL,"
+                " PRIMARY KEY (sha, ctx, stage))"
+            )
+        self._import_json_manifest()
+
+    def _connect(self):
+        # A fresh connection per call keeps this safe to use from any thread
+        return sqlite3.connect(self.manifest_path, timeout=30, isolation_level=None)
+
+    def _import_json_manifest(self):
+        """
+        Moves the manifest.json written by earlier versions into the database, once.
+        """
+        json_path = os.path.join(self.root, 'manifest.json')
+        if not os.path.exists(json_path):
+            return
+        try:
+            with open(json_path, 'r') as f:
+                objects = json.load(f).get('objects', {})
+        except (OSError, ValueError):
+            logger.warning("Ignoring unreadable manifest %s.", json_path)
+            objects = {}
+        now = time.time()
+        with self._connect() as conn:
+            for sha, entry in objects.items():
+                for name in entry.get('names', []):
+                    conn.execute("INSERT OR IGNORE INTO names (sha, name) VALUES (?, ?)", (sha, name))
+                for ctx, stages in entry.get('contexts', {}).items():
+                    for stage, value in stages.items():
+                        conn.execute(
+                            "INSERT OR IGNORE INTO stages (sha, ctx, stage, value, updated) VALUES (?, ?, ?, ?, ?)",
+                            (sha, ctx, stage, json.dumps(value), now),
+                        )
+        os.replace(json_path, f"{json_path}.imported")
+
+    def path(self, sha):
+        """
+        Location of the stored attachment with this hash.
+        """
+        return os.path.join(self.objects_dir, sha[:2], f"{sha}.pdf")
+
+    def output_path(self, sha, ctx, kind):
+        """
+        Location of a derived file (e.g. 'signed') for an attachment and context.
+        """
+        return os.path.join(self.outputs_dir, f"{kind}_{sha[:16]}_{ctx[:12]}.pdf")
+
+    def put_file(self, source_path, filename=None, keep_source=False):
+        """
+        Adds a file to the store and returns its hash. The source is moved in unless
+        keep_source is set; if the same bytes are already stored it is simply dropped.
+        """
+        sha = file_sha256(source_path)
+        target = self.path(sha)
+        if not os.path.exists(target):
+            os.makedirs(os.path.dirname(target), exist_ok=True)
+            # Copy under a unique name first, another worker may be storing the same bytes
+            tmp_path = f"{target}.{os.getpid()}.{threading.get_ident()}.tmp"
+            if keep_source:
+                shutil.copyfile(source_path, tmp_path)
+            else:
+                shutil.move(source_path, tmp_path)
+            os.replace(tmp_path, target)
+        elif not keep_source:
+            os.remove(source_path)
+        with self._connect() as conn:
+            conn.execute("INSERT OR IGNORE INTO names (sha, name) VALUES (?, ?)",
+                         (sha, filename or os.path.basename(source_path)))
+        return sha
+
+    def put_bytes(self, data, filename):
+        """
+        Adds an attachment held in memory to the store and returns its hash.
+        """
+        fd, tmp_path = tempfile.mkstemp(prefix='.incoming_', suffix='.pdf', dir=self.objects_dir)
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                f.write(data)
+            return self.put_file(tmp_path, filename)
+        finally:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+
+    def name(self, sha):
+        """
+        First filename the attachment was seen under.
+        """
+        with self._connect() as conn:
+            row = conn.execute("SELECT name FROM names WHERE sha = ? ORDER BY seq LIMIT 1", (sha,)).fetchone()
+        return row[0] if row else f"{sha[:16]}.pdf"
+
+    def stage(self, sha, ctx, stage):
+        """
+        Returns the recorded result of a stage, or None if it hasn't completed.
+        File results are only trusted while the file still exists.
+        """
+        with self._connect() as conn:
+            row = conn.execute("SELECT value FROM stages WHERE sha = ? AND ctx = ? AND stage = ?",
+                               (sha, ctx, stage)).fetchone()
+        value = json.loads(row[0]) if row else None
+        if stage == 'signed' and value and not os.path.exists(value):
+            return None
+        return value
+
+    def mark(self, sha, ctx, stage, value=True):
+        """
+        Records that a stage completed for this attachment and context.
+        """
+        if stage not in STAGES:
+            raise ValueError(f"Unknown stage {stage!r}")
+        with self._connect() as conn:
+            conn.execute(
+                "INSERT OR REPLACE INTO stages (sha, ctx, stage, value, updated) VALUES (?, ?, ?, ?, ?)",
+                (sha, ctx, stage, json.dumps(value), time.time()),
+            )
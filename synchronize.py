@@ -1,26 +1,213 @@
 import os
-from autofill import fill_pdf_form
-from sign import sign_pdf
+import queue
+import functools
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from autofill import extract_pdf_fields, get_form_data_from_chatgpt
+from pdf_pipeline import fill_flatten_sign
+from store import AttachmentStore, context_key
 
-def process_pdfs(additional_text):
+logger = logging.getLogger(__name__)
+
+_DONE = object()  # Sentinel that tells the dispatcher the LLM stage has finished
+
+# Outputs of earlier runs that used to be written next to the inputs
+OUTPUT_PREFIXES = ('filled_', 'signed_filled_')
+
+def collect_pdfs(input_folder, store):
+    """
+    Adds every input PDF in input_folder to the store and returns the unique hashes,
+    in filename order. Outputs of earlier runs are skipped.
+    """
+    shas = []
+    for filename in sorted(os.listdir(input_folder)):
+        path = os.path.join(input_folder, filename)
+        if not filename.endswith('.pdf') or filename.startswith(OUTPUT_PREFIXES) or not os.path.isfile(path):
+            continue
+        sha = store.put_file(path, filename, keep_source=True)
+        if sha not in shas:
+            shas.append(sha)
+    return shas
+
+def process_pdfs(additional_text, pipelined=False, llm_concurrency=4, cpu_workers=None, queue_size=8):
+    """
+    Fills and signs every PDF in DownloadedPDFs. Signed copies are written to the
+    attachment store; returns a list of dicts with 'input', 'output' and 'error'.
+    """
     input_folder = 'DownloadedPDFs'       # Path to the folder containing PDFs
     signature_image = 'signature.png'     # Path to your signature image
 
-    # Loop through all files in the input folder
-    for filename in os.listdir(input_folder):
-        if filename.endswith('.pdf'):  # Only process PDF files
-            input_pdf = os.path.join(input_folder, filename)
-            filled_pdf = os.path.join(input_folder, f"filled_{filename}")
-            signed_pdf = os.path.join(input_folder, f"signed_filled_{filename}")
+    if pipelined:
+        return process_pdfs_pipelined(input_folder, signature_image, additional_text,
+                                      llm_concurrency, cpu_workers, queue_size)
+
+    store = AttachmentStore()
+    ctx = context_key(additional_text)
+
+    # Loop through all unique PDFs, skipping the stages a previous run already finished.
+    # Outputs go to the store, so report where each input's signed copy ended up.
+    results = []
+    for sha in collect_pdfs(input_folder, store):
+        try:
+            signed_pdf = _process_pdf(store, sha, ctx, additional_text, signature_image)
+        except Exception as e:
+            # One bad PDF shouldn't stop the rest of the batch
+            logger.error("Failed to process %s: %s", store.name(sha), e)
+            results.append({'input': store.name(sha), 'output': None, 'error': str(e)})
+            continue
+        results.append({'input': store.name(sha), 'output': signed_pdf, 'error': None})
+        logger.info("Signed %s: %s", store.name(sha), signed_pdf)
+    return results
+
+def _process_pdf(store, sha, ctx, additional_text, signature_image):
+    """
+    Runs the remaining stages for one stored PDF and returns the signed output path.
+    """
+    input_pdf = store.path(sha)
+    signed_pdf = store.output_path(sha, ctx, 'signed')
+    if store.stage(sha, ctx, 'signed'):
+        logger.info("Already processed and signed: %s", signed_pdf)
+        return signed_pdf
+
+    # Fill, flatten and sign in one pass, so the only write is the update appended to
+    # a copy of the input instead of two full rewrites
+    form_data = _answer_pdf(store, sha, ctx, additional_text)
+    fill_flatten_sign(input_pdf, form_data, signature_image, signed_pdf)
+    store.mark(sha, ctx, 'signed', signed_pdf)
+    return signed_pdf
+
+def _answer_pdf(store, sha, ctx, additional_text):
+    """
+    Network-bound stage: extract the fields and ask ChatGPT for the values.
+    Results are recorded in the manifest so a resumed run doesn't repeat them.
+    """
+    form_data = store.stage(sha, ctx, 'answered')
+    if form_data is not None:
+        return form_data
+    field_list = store.stage(sha, ctx, 'extracted')
+    if field_list is None:
+        field_list = extract_pdf_fields(store.path(sha))
+        store.mark(sha, ctx, 'extracted', field_list)
+    form_data = get_form_data_from_chatgpt(field_list, additional_text)
+    store.mark(sha, ctx, 'answered', form_data)
+    return form_data
+
+def _fill_and_sign(input_pdf, signed_pdf, form_data, signature_image):
+    """
+    CPU-bound stage, run in a worker process: fill, flatten and sign one PDF in memory.
+    """
+    return fill_flatten_sign(input_pdf, form_data, signature_image, signed_pdf)
+
+def process_pdfs_pipelined(input_folder, signature_image, additional_text,
+                           llm_concurrency=4, cpu_workers=None, queue_size=8, store=None):
+    """
+    Processes every PDF in input_folder with the LLM calls and the fill/sign work overlapped.
+    LLM requests run on a thread pool limited to llm_concurrency, their answers go through a
+    bounded queue to a process pool that fills and signs, with at most queue_size documents
+    in the pool at a time. Each document is recorded in the manifest as soon as it's signed.
+    A failing document is reported in the results instead of stopping the batch, and
+    finished documents are skipped on re-runs.
+    Returns a list of dicts with 'input', 'output' and 'error' for each unique PDF.
+    """
+    store = store or AttachmentStore()
+    ctx = context_key(additional_text)
+    shas = collect_pdfs(input_folder, store)
+    results = {}
+    answered = queue.Queue(maxsize=queue_size)
+
+    def answer(sha):
+        input_pdf = store.path(sha)
+        signed_pdf = store.stage(sha, ctx, 'signed')
+        if signed_pdf:
+            results[sha] = {'input': store.name(sha), 'output': signed_pdf, 'error': None}
+            return
+        try:
+            form_data = _answer_pdf(store, sha, ctx, additional_text)
+        except Exception as e:
+            results[sha] = {'input': store.name(sha), 'output': None, 'error': str(e)}
+            return
+        # Blocks while the fill/sign stage is behind, so answers don't pile up in memory
+        answered.put((sha, input_pdf, form_data))
+
+    # At most queue_size documents are in the process pool, on top of the answers
+    # waiting in the queue; a slot is freed as soon as its document is done
+    slots = threading.Semaphore(queue_size)
+
+    def finished(sha, future):
+        try:
+            signed_pdf = future.result()
+            store.mark(sha, ctx, 'signed', signed_pdf)
+            results[sha] = {'input': store.name(sha), 'output': signed_pdf, 'error': None}
+            logger.info("Processed and signed: %s", signed_pdf)
+        except Exception as e:
+            fail(sha, e)
+        finally:
+            slots.release()
+
+    def fail(sha, error):
+        results[sha] = {'input': store.name(sha), 'output': None, 'error': str(error)}
+
+    def dispatch():
+        # Owns the process pool. A worker process that dies (say MuPDF crashing on a
+        # malformed PDF) breaks the pool: its documents fail through their futures and
+        # the rest go to a fresh pool. Whatever happens, the queue is drained until
+        # _DONE so the LLM threads never block on a full queue.
+        cpu_pool = None
+        try:
+            cpu_pool = ProcessPoolExecutor(max_workers=cpu_workers)
+            while True:
+                item = answered.get()
+                if item is _DONE:
+                    break
+                sha, input_pdf, form_data = item
+                args = (input_pdf, store.output_path(sha, ctx, 'signed'), form_data, signature_image)
+                slots.acquire()
+                try:
+                    try:
+                        future = cpu_pool.submit(_fill_and_sign, *args)
+                    except BrokenProcessPool:
+                        logger.warning("A fill/sign worker died, starting a new process pool.")
+                        cpu_pool.shutdown(wait=False)
+                        cpu_pool = ProcessPoolExecutor(max_workers=cpu_workers)
+                        future = cpu_pool.submit(_fill_and_sign, *args)
+                except Exception as e:
+                    fail(sha, e)
+                    slots.release()
+                    continue
+                future.add_done_callback(functools.partial(finished, sha))
+        except Exception as e:
+            logger.exception("Fill/sign dispatcher failed")
+            # Fail everything still queued, and keep draining until the LLM stage is done
+            while True:
+                item = answered.get()
+                if item is _DONE:
+                    break
+                fail(item[0], e)
+        finally:
+            # Wait for the documents still in the pool
+            for _ in range(queue_size):
+                slots.acquire()
+            if cpu_pool is not None:
+                cpu_pool.shutdown()
 
-            # Step 1: Fill the PDF form with the provided additional text
-            fill_pdf_form(input_pdf, filled_pdf, additional_text)
+    dispatcher = threading.Thread(target=dispatch)
+    dispatcher.start()
+    try:
+        with ThreadPoolExecutor(max_workers=llm_concurrency) as llm_pool:
+            list(llm_pool.map(answer, shas))
+    finally:
+        answered.put(_DONE)
+        dispatcher.join()
 
-            # Step 2: Sign the filled PDF
-            sign_pdf(filled_pdf, signed_pdf, signature_image)
-            print(f"Processed and signed: {signed_pdf}")
+    for sha in shas:
+        if results[sha]['error']:
+            logger.error("Failed to process %s: %s", results[sha]['input'], results[sha]['error'])
+    return [results[sha] for sha in shas]
 
 # Example usage
 if __name__ == '__main__':
+    logging.basicConfig(level=os.getenv('AUTOFILL_LOG_LEVEL', 'INFO'), format='%(message)s')
     additional_text = input("Enter the additional text to fill the PDFs: ")
     process_pdfs(additional_text)
@@ -0,0 +1,178 @@
+import os
+import sys
+import json
+import hashlib
+import logging
+import threading
+from cache import CACHE_DIR
+from resolver import MIN_CONFIDENCE
+from validation import validate_value
+
+logger = logging.getLogger(__name__)
+
+# One reviewable JSON file per template. Learned constants can hold personal data, so
+# they live with the other caches outside version control by default
+TEMPLATE_DIR = os.getenv('AUTOFILL_TEMPLATE_DIR', os.path.join(CACHE_DIR, 'templates'))
+CONSTANT_AFTER = 3  # Same answer for this many different emails makes a field a constant
+FINGERPRINT_KEYS = ('name', 'type', 'field_flags', 'max_length', 'options', 'page', 'rect')
+
+def template_fingerprint(field_list):
+    """
+    Structural hash of a field list, the same for every copy of a template whatever
+    is filled in. Built from the extracted fields, so it works for either backend.
+    """
+    canonical = [[field.get(key) for key in FINGERPRINT_KEYS] for field in field_list if 'name' in field]
+    return hashlib.sha256(json.dumps(canonical, separators=(',', ':')).encode('utf-8')).hexdigest()
+
+def _normalize(value):
+    return ''.join(ch for ch in str(value).casefold() if ch.isalnum())
+
+class TemplateRegistry:
+    """
+    Learned field -> slot mappings for templates that have been answered before, keyed by
+    fingerprint. Each template is a JSON file under root that can be reviewed and edited:
+
+        "fields": {"applicant.email": "email", "country": {"value": "USA"}, "notes": null}
+
+    A slot name takes the value of that fact from the email (see resolver.extract_facts),
+    {"value": ...} is a fixed answer and null always asks ChatGPT. Learning only adds
+    fields that aren't in the mapping yet, so hand edits are never overwritten.
+    Fields the mapping can't answer are listed under "unmapped".
+    """
+
+    def __init__(self, root=TEMPLATE_DIR):
+        self.root = root
+        self._entries = {}  # fingerprint -> (mtime, entry)
+        self._lock = threading.Lock()
+
+    def path(self, fingerprint):
+        return os.path.join(self.root, f"{fingerprint[:24]}.json")
+
+    def get(self, fingerprint):
+        """
+        Returns the template entry, or None if the template hasn't been learned.
+        Files edited on disk are picked up on the next call.
+        """
+        path = self.path(fingerprint)
+        try:
+            mtime = os.stat(path).st_mtime_ns
+        except OSError:
+            return None
+        cached = self._entries.get(fingerprint)
+        if cached and cached[0] == mtime:
+            return cached[1]
+        try:
+            with open(path, 'r') as f:
+                entry = json.load(f)
+        except (OSError, ValueError) as e:
+            logger.warning("Ignoring unreadable template %s: %s", path, e)
+            return None
+        if entry.get('fingerprint') != fingerprint:
+            return None
+        self._entries[fingerprint] = (mtime, entry)
+        return entry
+
+    def save(self, entry):
+        os.makedirs(self.root, exist_ok=True)
+        path = self.path(entry['fingerprint'])
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        with open(tmp_path, 'w') as f:
+            json.dump(entry, f, indent=2, sort_keys=True)
+        os.replace(tmp_path, path)
+        self._entries[entry['fingerprint']] = (os.stat(path).st_mtime_ns, entry)
+
+    def fill(self, fingerprint, field_list, facts):
+        """
+        Answers the mapped fields of a known template from the email facts.
+        Returns (form_data, leftover): leftover are the fields that still need ChatGPT,
+        including mapped ones whose fact isn't in this email or whose value doesn't fit.
+        """
+        entry = self.get(fingerprint)
+        if not entry:
+            return {}, field_list
+        mapping = entry.get('fields', {})
+        form_data, leftover = {}, []
+        for field in field_list:
+            slot = mapping.get(field.get('name'))
+            value = None
+            if isinstance(slot, dict):
+                value = slot.get('value')
+            elif isinstance(slot, str) and slot in facts and facts[slot][1] >= MIN_CONFIDENCE:
+                value = facts[slot][0]
+            if value is not None:
+                value, ok = validate_value(field, value)
+                if ok:
+                    form_data[field['name']] = value
+                    continue
+            leftover.append(field)
+        return form_data, leftover
+
+    def learn(self, fingerprint, field_list, form_data, facts, context=None):
+        """
+        Records which slot each answered field corresponds to: a field whose answer equals
+        a fact from the email is mapped to that fact, and a field that got the same answer
+        for CONSTANT_AFTER different emails becomes a constant. context identifies the
+        email, so re-running the same one doesn't count twice.
+        """
+        fact_values = [(slot, _normalize(value)) for slot, (value, _) in facts.items() if _normalize(value)]
+        with self._lock:
+            entry = self.get(fingerprint) or {'fingerprint': fingerprint, 'fields': {}, 'observed': {}}
+            mapping, observed = entry['fields'], entry.setdefault('observed', {})
+            changed = False
+            for field in field_list:
+                name = field.get('name')
+                if not name or name in mapping or form_data.get(name) in (None, ''):
+                    continue
+                answer = _normalize(form_data[name])
+                slot = next((slot for slot, value in fact_values if value == answer), None)
+                if slot:
+                    mapping[name] = slot
+                    observed.pop(name, None)
+                    changed = True
+                    continue
+                value, streak, seen = observed.get(name, [None, 0, None])
+                if value == form_data[name] and seen == context:
+                    continue
+                streak = streak + 1 if value == form_data[name] else 1
+                observed[name] = [form_data[name], streak, context]
+                if streak >= CONSTANT_AFTER:
+                    mapping[name] = {'value': form_data[name]}
+                    del observed[name]
+                changed = True
+            unmapped = sorted(field['name'] for field in field_list if field.get('name') and field['name'] not in mapping)
+            if changed or entry.get('unmapped') != unmapped:
+                entry['unmapped'] = unmapped
+                entry['learned_from'] = entry.get('learned_from', 0) + 1
+                self.save(entry)
+
+    def entries(self):
+        """
+        Returns every learned template entry.
+        """
+        if not os.path.isdir(self.root):
+            return []
+        entries = []
+        for filename in sorted(os.listdir(self.root)):
+            if filename.endswith('.json'):
+                try:
+                    with open(os.path.join(self.root, filename), 'r') as f:
+                        entries.append(json.load(f))
+                except (OSError, ValueError):
+                    continue
+        return entries
+
+def main():
+    """
+    Lists the learned templates for review.
+    """
+    registry = TemplateRegistry(sys.argv[1] if len(sys.argv) > 1 else TEMPLATE_DIR)
+    for entry in registry.entries():
+        mapping = entry.get('fields', {})
+        mapped = sum(1 for slot in mapping.values() if slot is not None)
+        print(f"{entry['fingerprint'][:24]}  {mapped} mapped, {len(entry.get('unmapped', []))} unmapped, "
+              f"learned from {entry.get('learned_from', 0)} forms")
+        for name, slot in sorted(mapping.items()):
+            print(f"    {name}: {json.dumps(slot)}")
+
+if __name__ == '__main__':
+    main()
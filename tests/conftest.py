@@ -0,0 +1,6 @@
+import os
+import sys
+
+# The modules are flat files in the repository root; the synthetic forms live in benchmarks/
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path[:0] = [ROOT, os.path.join(ROOT, 'benchmarks')]
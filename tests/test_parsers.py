@@ -0,0 +1,124 @@
+"""
+Checks for the hand-written parsers: the PDF object tokenizer behind the fitz extractor,
+the salvage of cut-off model replies and the chunked base64 attachment decoder.
+"""
+import io
+import base64
+import pytest
+import fitz  # PyMuPDF
+from pypdf import PdfReader, PdfWriter
+from pypdf.generic import ArrayObject, DictionaryObject, FloatObject, NameObject, TextStringObject
+import attachments
+from attachments import AttachmentError, decode_base64_attachment
+from extractor import extract_fields
+from pdf_utils import PdfName, PdfRef, parse_pdf_object
+from synthetic import generate_form
+from validation import parse_json_object
+
+EDGE_CASE_NAMES = ['a(b)c', 'back\\slash', 'unbalanced (paren', 'tab\there', 'café', 'Имя заявителя', '名前']
+
+def _both_backends(data):
+    return extract_fields(PdfReader(io.BytesIO(data)), 'pypdf'), extract_fields(fitz.open(stream=data), 'fitz')
+
+def _form_with_names(names):
+    writer = PdfWriter()
+    page = writer.add_blank_page(612, 792)
+    fields = ArrayObject()
+    page[NameObject('/Annots')] = ArrayObject()
+    writer._root_object[NameObject('/AcroForm')] = DictionaryObject({NameObject('/Fields'): fields})
+    for index, name in enumerate(names):
+        y = 700 - 30 * index
+        widget = DictionaryObject({
+            NameObject('/T'): TextStringObject(name),
+            NameObject('/FT'): NameObject('/Tx'),
+            NameObject('/Type'): NameObject('/Annot'),
+            NameObject('/Subtype'): NameObject('/Widget'),
+            NameObject('/Rect'): ArrayObject([FloatObject(50), FloatObject(y), FloatObject(200), FloatObject(y + 20)]),
+            NameObject('/P'): page.indirect_reference,
+        })
+        ref = writer._add_object(widget)
+        fields.append(ref)
+        page['/Annots'].append(ref)
+    out = io.BytesIO()
+    writer.write(out)
+    return out.getvalue()
+
+@pytest.mark.parametrize('options', [
+    {},
+    {'pages': 3, 'fields': 40, 'depth': 3},
+    {'pages': 2, 'fields': 30, 'options': 4, 'option_every': 3, 'widgets': 2},
+])
+def test_backends_agree_on_synthetic_forms(options):
+    pypdf_fields, fitz_fields = _both_backends(generate_form(**options))
+    assert pypdf_fields
+    assert fitz_fields == pypdf_fields
+
+def test_backends_agree_on_edge_case_names():
+    pypdf_fields, fitz_fields = _both_backends(_form_with_names(EDGE_CASE_NAMES))
+    assert [field['name'] for field in fitz_fields] == EDGE_CASE_NAMES
+    assert fitz_fields == pypdf_fields
+
+@pytest.mark.parametrize('source, expected', [
+    ('(a\\(b\\)c)', 'a(b)c'),
+    ('(back\\\\slash)', 'back\\slash'),
+    ('(caf\\351)', 'café'),
+    ('(line\\nbreak\\ttab)', 'line\nbreak\ttab'),
+    ('(split \\\nline)', 'split line'),
+    ('<FEFF540D524D>', '名前'),
+    ('<4869 21>', 'Hi!'),
+    ('<48692>', 'Hi '),
+    ('/A#20B', PdfName('/A B')),
+    ('12 0 R', PdfRef(12)),
+    ('-3.5', -3.5),
+    ('true', True),
+    ('null', None),
+])
+def test_parse_pdf_object_values(source, expected):
+    value = parse_pdf_object(source)
+    assert value == expected
+    assert type(value) is type(expected)
+
+def test_parse_pdf_object_nested():
+    source = '<< /T (name) /Kids [ 4 0 R 5 0 R ] /MK << /CA (\\(x\\)) >> /Rect [ 0 .5 10 20 ] /Ff 2 >>'
+    assert parse_pdf_object(source) == {
+        '/T': 'name',
+        '/Kids': [PdfRef(4), PdfRef(5)],
+        '/MK': {'/CA': '(x)'},
+        '/Rect': [0, 0.5, 10, 20],
+        '/Ff': 2,
+    }
+
+def test_parse_json_object_complete():
+    assert parse_json_object('Sure!\n```json\n{"a": "1", "b": [1, 2],}\n```') == ({'a': '1', 'b': [1, 2]}, True)
+
+@pytest.mark.parametrize('reply, salvaged', [
+    ('{"name": "Ann", "city": "Par', {'name': 'Ann'}),
+    ('{"name": "Ann", "tags": ["a", "b"], "note": "say \\"hi', {'name': 'Ann', 'tags': ['a', 'b']}),
+    ('{"na\\u00efve": 1, "next"', {'naïve': 1}),
+    ('{"broken', {}),
+    ('no object here', {}),
+])
+def test_parse_json_object_salvages_cut_off_replies(reply, salvaged):
+    assert parse_json_object(reply) == (salvaged, False)
+
+@pytest.mark.parametrize('chunk_size', [1, 3, 4, 5, 7, 64])
+@pytest.mark.parametrize('length', [1, 2, 3, 4, 50, 301])
+def test_decode_base64_across_chunk_boundaries(tmp_path, monkeypatch, chunk_size, length):
+    monkeypatch.setattr(attachments, 'CHUNK_SIZE', chunk_size)
+    data = bytes(range(256)) * 2
+    data = data[:length]
+    encoded = base64.urlsafe_b64encode(data).decode('ascii')
+    # Wrapped like a MIME body, with and without the padding
+    for content in (encoded, encoded.rstrip('='), '\r\n'.join(encoded[i:i + 10] for i in range(0, len(encoded), 10))):
+        target = tmp_path / 'out.pdf'
+        assert decode_base64_attachment(content, str(target)) == length
+        assert target.read_bytes() == data
+
+def test_decode_base64_rejects_bad_content(tmp_path):
+    target = tmp_path / 'out.pdf'
+    with pytest.raises(AttachmentError):
+        decode_base64_attachment('not*base64!', str(target))
+    with pytest.raises(AttachmentError):
+        decode_base64_attachment(base64.b64encode(b'x' * 100).decode('ascii'), str(target), max_bytes=10)
+    assert not target.exists()
+    assert not (tmp_path / 'out.pdf.part').exists()
@@ -0,0 +1,117 @@
+import re
+import json
+import difflib
+
+CODE_FENCE = re.compile(r'^\s*```[A-Za-z]*\s*$', re.MULTILINE)
+TRAILING_COMMA = re.compile(r',\s*([}\]])')
+PAIR_KEY = re.compile(r'\s*,?\s*"((?:[^"\\]|\\.)*)"\s*:\s*')
+COMB_SEPARATORS = re.compile(r'[\s\-/.()]')
+OPTION_CUTOFF = 0.6  # Minimum difflib similarity for a nearest-option match
+
+def parse_json_object(text):
+    """
+    Tolerant parser for the JSON object in a model reply. Code fences and prose around
+    the object are ignored and trailing commas are dropped. If the object is cut off or
+    damaged, the complete "key": value pairs before the damage are salvaged.
+    Returns (data, complete).
+    """
+    text = CODE_FENCE.sub('', text or '')
+    start = text.find('{')
+    if start < 0:
+        return {}, False
+
+    decoder = json.JSONDecoder()
+    for candidate in (text[start:], TRAILING_COMMA.sub(r'\1', text[start:])):
+        try:
+            data, _ = decoder.raw_decode(candidate)
+        except ValueError:
+            continue
+        if isinstance(data, dict):
+            return data, True
+
+    data = {}
+    pos = start + 1
+    while True:
+        match = PAIR_KEY.match(text, pos)
+        if not match:
+            break
+        try:
+            value, pos = decoder.raw_decode(text, match.end())
+        except ValueError:
+            break
+        data[json.loads(f'"{match.group(1)}"')] = value
+    return data, False
+
+def _normalize_option(value):
+    return re.sub(r'[^a-z0-9]+', '', str(value).casefold())
+
+def nearest_option(value, options):
+    """
+    Maps a value onto one of the field's options: exact, then ignoring case and
+    punctuation, then the closest spelling. Returns None if nothing is close enough.
+    """
+    if value in options:
+        return value
+    normalized = {_normalize_option(option): option for option in options}
+    key = _normalize_option(value)
+    if key in normalized:
+        return normalized[key]
+    close = difflib.get_close_matches(key, list(normalized), n=1, cutoff=OPTION_CUTOFF)
+    return normalized[close[0]] if close else None
+
+def fit_length(value, max_length, comb=False):
+    """
+    Makes a text value fit max_length. Comb fields draw one character per cell, so
+    separators are dropped before cutting and short values are padded to fill the cells.
+    """
+    if comb:
+        if len(value) > max_length:
+            value = COMB_SEPARATORS.sub('', value)
+        return value[:max_length].ljust(max_length)
+    return value[:max_length].rstrip() if len(value) > max_length else value
+
+def validate_value(field, value):
+    """
+    Checks one value against its field and applies the local fixes.
+    Returns (value, ok).
+    """
+    if value is None or isinstance(value, dict):
+        return None, False
+    options = field.get('options')
+    if isinstance(value, list):
+        if not options or 'MultiSelect' not in field.get('field_flags', []):
+            return None, False
+        matched = [nearest_option(str(item), options) for item in value]
+        return matched, bool(matched) and None not in matched
+    if not isinstance(value, bool):
+        value = str(value).strip()
+        if not value:
+            return None, False
+
+    flags = field.get('field_flags', [])
+    if options and 'Edit' not in flags and not isinstance(value, bool):
+        value = nearest_option(value, options)
+        if value is None:
+            return None, False
+    max_length = field.get('max_length')
+    if max_length and isinstance(value, str):
+        value = fit_length(value, max_length, comb='Comb' in flags)
+    return value, True
+
+def validate_form_data(field_list, form_data):
+    """
+    Validates a reply against the field list built by process_fields. Unknown keys
+    are dropped, fixable values are repaired in place of the originals.
+    Returns (valid, failed): the usable values and the fields that need a new answer.
+    """
+    valid, failed = {}, []
+    for field in field_list:
+        name = field.get('name')
+        if not name:
+            continue
+        value, ok = validate_value(field, form_data.get(name))
+        if ok:
+            valid[name] = value
+        else:
+            failed.append(field)
+    return valid, failed